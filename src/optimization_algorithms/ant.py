@@ -1,17 +1,26 @@
-import random
-import copy
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from utility.product import Product
+from utility.product_table import ProductTable
 from utility.rack import Rack
 from utility.shelf import Shelf
-from optimization_algorithms.optimizer import Optimizer
+from utility.warehouse_index import WarehouseIndex
+from utility.placement_session import PlacementSession
+from utility.packing_engine import PackingEngine
+from utility.shared_batch import SharedBatch
+from utility.fit_cache import fit_cache
+from utility.warehouse_tensor import shelf_costs
+from optimization_algorithms.optimizer import Optimizer, SearchBudget, seed_sequence_state, seed_sequence_from_state
+from optimization_algorithms.pheromones import PheromoneStore, PHEROMONE_MODELS, make_pheromones
 
 class AntColonyOptimizer(Optimizer):
     """
     Rozwiązuje problem rozmieszczenia za pomocą algorytmu optymalizacji mrowiskowej (ACO).
     """
 
-    def __init__(self, num_ants=10, generations=50, alpha=1.0, beta=2.0, evaporation_rate=0.5, q=100.0):
+    def __init__(self, num_ants=10, generations=50, alpha=1.0, beta=2.0, evaporation_rate=0.5, q=100.0, seed=None, workers=1,
+                 candidate_count=None, pheromone_min=None, pheromone_max=None, pheromone_model="dense", frequency_buckets=4,
+                 budget=None, warm_start=False):
         """
         Args:
             num_ants (int): Liczba mrówek w każdej generacji.
@@ -20,24 +29,51 @@ class AntColonyOptimizer(Optimizer):
             beta (float): Wpływ informacji heurystycznej (atrakcyjności) na decyzję.
             evaporation_rate (float): Współczynnik parowania feromonów (0 < rho < 1).
             q (float): Ilość feromonu zostawianego przez mrówki.
+            seed (int | None): Ziarno strumieni losowych mrówek; bez niego brane z globalnego np.random.
+            workers (int): Liczba procesów budujących mrówki jednej generacji równolegle.
+            candidate_count (int | None): Rozmiar listy kandydatów - mrówka wybiera spośród k najatrakcyjniejszych
+                półek, a pełny zbiór sprawdza tylko, gdy żadna z nich nie pomieści produktu. None - wszystkie półki.
+            pheromone_min, pheromone_max (float | None): Ograniczenia śladu feromonowego w stylu MAX-MIN.
+            pheromone_model (str): "dense" - ślad per produkt i półka, "class" - ślad per klasa produktów
+                (wymiary w wokselach i przedział częstotliwości), "sparse" - tylko wpisy różne od poziomu bazowego.
+            frequency_buckets (int): Liczba przedziałów częstotliwości przy podziale na klasy.
+            budget (SearchBudget | None): Domyślny limit czasu/stagnacji dla każdej partii.
+            warm_start (bool): Ślad feromonowy poprzedniej partii przenoszony na kolejną (po product_id i shelf_id).
         """
+        if pheromone_model not in PHEROMONE_MODELS:
+            raise ValueError(f"Unknown pheromone model '{pheromone_model}'. Available: {', '.join(PHEROMONE_MODELS)}.")
+
         self.num_ants = num_ants
         self.generations = generations
         self.alpha = alpha
         self.beta = beta
         self.evaporation_rate = evaporation_rate
         self.q = q
+        self.seed = seed
+        self._seed_sequence = np.random.SeedSequence(seed) if seed is not None else None
+        self.workers = workers
+        self._executor: ProcessPoolExecutor | None = None
+        self.candidate_count = candidate_count
+        self.pheromone_min = pheromone_min
+        self.pheromone_max = pheromone_max
+        self.pheromone_model = pheromone_model
+        self.frequency_buckets = frequency_buckets
+        self.budget: SearchBudget | None = budget
+        self.warm_start = warm_start
+        self._warm_pheromones: dict | None = None
+        self._candidates: np.ndarray | None = None
 
         self._best_cost = float('inf')
         self.best_solution_ever = None
+        self._placement_order = None
+        self._engine: PackingEngine | None = None
 
-    def solve(self, batch: list[Product], racks: list[Rack]):
+    def solve(self, batch: list[Product], racks: list[Rack], budget: SearchBudget | None = None):
         self._best_cost = float('inf')
         self.best_solution_ever = None
 
         all_shelves = [shelf for rack in racks for shelf in rack.shelves]
-        num_products = len(batch)
-        num_shelves = len(all_shelves)
+        progress = self._start_search(budget, batch, all_shelves)
 
         if not all_shelves or not batch:
             print("No shelves or products to process.")
@@ -45,34 +81,74 @@ class AntColonyOptimizer(Optimizer):
             return
             
         # 1. Inicjalizacja feromonów i heurystyk
-        pheromones = np.ones((num_products, num_shelves))
-        attractiveness = self._calculate_attractiveness(all_shelves)
+        table = ProductTable(batch)
+        pheromones = make_pheromones(self.pheromone_model, table, len(all_shelves), self.frequency_buckets)
+        product_ids = table.product_ids
+        shelf_ids = np.array([shelf.shelf_id for shelf in all_shelves], dtype=str)
+        if self.warm_start and self._warm_pheromones is not None:
+            pheromones.import_state(self._warm_pheromones, product_ids, shelf_ids)
+            if self.pheromone_min is not None or self.pheromone_max is not None:
+                pheromones.clip(self.pheromone_min, self.pheromone_max)
+        heuristic = self._prepare_heuristic(all_shelves)
+        fit_index = WarehouseIndex(all_shelves)
+        # Mrówki umieszczają produkty od największego - kolejność liczona raz na partię
+        self._placement_order = table.order_by_volume()
+        # Ocena rozwiązań z pamięcią wyników per półka (w kolejności produktów w partii, jak dotąd)
+        self._engine = PackingEngine(all_shelves, batch)
 
         print(f"  > Starting ACO: {self.generations} generations, {self.num_ants} ants per generation.")
 
-        for gen in range(self.generations):
-            all_ant_solutions = []
-            
-            # 2. Każda mrówka buduje swoje rozwiązanie
-            for ant in range(self.num_ants):
-                temp_shelves = copy.deepcopy(all_shelves)
-                
-                solution = self._construct_solution_for_ant(batch, temp_shelves, pheromones, attractiveness)
-                cost, unplaced = self._evaluate_solution(solution, batch, all_shelves)
-                
-                all_ant_solutions.append((solution, cost, unplaced))
-            
-            # 3. Aktualizacja feromonów
-            self._update_pheromones(pheromones, all_ant_solutions)
-
-            # Śledzenie najlepszego rozwiązania
-            best_ant_in_gen = min(all_ant_solutions, key=lambda x: x[1] + x[2] * 1e9)
-            if best_ant_in_gen[1] < self._best_cost and best_ant_in_gen[2] == 0:
-                self._best_cost = best_ant_in_gen[1]
-                self.best_solution_ever = best_ant_in_gen[0]
+        # Każda mrówka w każdej generacji ma własny strumień losowy - wynik nie zależy od podziału na procesy
+        seed_sequence = self._seed_sequence or np.random.SeedSequence(int(np.random.randint(2**32, dtype=np.uint64)))
+
+        parallel = self.workers > 1 and not any(shelf.storage.continuous for shelf in all_shelves)
+        shared_batch = SharedBatch(all_shelves, batch) if parallel else None
+        if parallel and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        try:
+            for gen in range(self.generations):
+                ant_seeds = seed_sequence.spawn(self.num_ants)
+
+                # 2. Mrówki budują rozwiązania niezależnie - feromony są w tej fazie tylko czytane
+                if parallel:
+                    chunks = [chunk for chunk in np.array_split(np.arange(self.num_ants), self.workers) if len(chunk)]
+                    results = list(self._executor.map(
+                        _build_ants_chunk,
+                        [shared_batch.spec] * len(chunks),
+                        [self._colony_settings()] * len(chunks),
+                        [pheromones] * len(chunks),
+                        [[ant_seeds[ant] for ant in chunk] for chunk in chunks]
+                    ))
+                    all_ant_solutions = [ant_solution for chunk_solutions, _stats in results for ant_solution in chunk_solutions]
+                    for _chunk_solutions, stats in results:
+                        _add_evaluation_stats(self._engine, stats)
+                else:
+                    all_ant_solutions = self._build_ants(ant_seeds, batch, all_shelves, pheromones, heuristic, fit_index)
+
+                # 3. Aktualizacja feromonów - jedna redukcja po wszystkich mrówkach generacji
+                self._update_pheromones(pheromones, all_ant_solutions)
+
+                # Śledzenie najlepszego rozwiązania
+                best_ant_in_gen = min(all_ant_solutions, key=lambda x: x[1] + x[2] * 1e9)
+                if best_ant_in_gen[1] < self._best_cost and best_ant_in_gen[2] == 0:
+                    self._best_cost = best_ant_in_gen[1]
+                    self.best_solution_ever = best_ant_in_gen[0]
+
+                if progress.update(self._best_cost):
+                    break
+        finally:
+            if shared_batch is not None:
+                shared_batch.close()
+
+        if self.warm_start:
+            self._warm_pheromones = pheromones.export_state(product_ids, shelf_ids)
         
         # 4. Zastosuj najlepsze znalezione rozwiązanie
         print(f"  > ACO finished. Best cost for this batch: {self._best_cost:.2f}")
+        print(f"  > {progress.summary()}")
+        print(f"  > Pheromones ({self.pheromone_model}): {pheromones.nbytes / 2**20:.2f} MB.")
+        print(f"  > Evaluations: {self._engine.exact_calls} exact, {self._engine.surrogate_calls} surrogate.")
         unplaced_products: list[Product] = []
         if self.best_solution_ever:
             unplaced_products = self._apply_solution(self.best_solution_ever, batch, all_shelves)
@@ -84,73 +160,135 @@ class AntColonyOptimizer(Optimizer):
 
         return unplaced_products
 
+    def _build_ants(self, ant_seeds: list[np.random.SeedSequence], batch: list[Product], shelves: list[Shelf],
+                    pheromones: PheromoneStore, heuristic: np.ndarray, fit_index: WarehouseIndex) -> list[tuple[list[int], float, int]]:
+        """Buduje i ocenia mrówki o podanych ziarnach. Każda mrówka pracuje na żywym stanie półek, który potem jest cofany."""
+        # Wagi wyboru (feromon^alpha * heurystyka^beta) liczone raz na generację, a nie dla każdej mrówki i produktu
+        weights = pheromones.weights(self.alpha, heuristic)
+
+        ant_solutions = []
+        for ant_seed in ant_seeds:
+            with PlacementSession() as session:
+                solution = self._construct_solution_for_ant(
+                    batch, shelves, weights, fit_index, session, np.random.default_rng(ant_seed)
+                )
+            cost, unplaced = self._evaluate_solution(solution, batch, shelves)
+            ant_solutions.append((solution, cost, unplaced))
+        return ant_solutions
+
+    def _colony_settings(self) -> dict:
+        """Parametry konstrukcji mrówek przekazywane do procesów roboczych."""
+        return {"alpha": self.alpha, "beta": self.beta, "candidate_count": self.candidate_count}
+
+    def state_dict(self) -> dict:
+
+        # Licznik `n_children_spawned` sekwencji wyznacza ziarna mrówek kolejnych generacji
+        return {"seed_sequence": seed_sequence_state(self._seed_sequence), "warm_pheromones": self._warm_pheromones}
+
+    def load_state_dict(self, state: dict) -> None:
+
+        if state.get("seed_sequence") is not None:
+            self._seed_sequence = seed_sequence_from_state(state["seed_sequence"])
+        self._warm_pheromones = state.get("warm_pheromones")
+
+    def reseed(self, seed: int) -> None:
+
+        self.seed = seed
+        self._seed_sequence = np.random.SeedSequence(seed)
+
+    def close(self) -> None:
+        """Zamyka pulę procesów roboczych (jeśli była używana)."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
     def _calculate_attractiveness(self, shelves: list[Shelf]) -> np.ndarray:
         """Oblicza heurystyczną atrakcyjność każdej półki (odwrotność kosztu)."""
-        costs = np.array([s.access_cost + s.operational_cost for s in shelves])
+        costs = shelf_costs(shelves)
         return 1.0 / (costs + 1e-10)
 
-    def _construct_solution_for_ant(self, batch: list[Product], temp_shelves: list[Shelf], pheromones: np.ndarray, attractiveness: np.ndarray) -> list[int]:
-        """Jedna mrówka konstruuje jedno kompletne rozwiązanie (przypisanie produktów do półek)."""
+    def _prepare_heuristic(self, shelves: list[Shelf]) -> np.ndarray:
+        """Składnik heurystyczny attractiveness^beta i lista kandydatów - raz na partię."""
+        heuristic = self._calculate_attractiveness(shelves) ** self.beta
+        self._candidates = None
+        if self.candidate_count is not None and self.candidate_count < len(shelves):
+            self._candidates = np.argsort(-heuristic, kind="stable")[:self.candidate_count]
+        return heuristic
+
+    def _construct_solution_for_ant(self, batch: list[Product], shelves: list[Shelf], weights, fit_index: WarehouseIndex, session: PlacementSession, rng: np.random.Generator) -> list[int]:
+        """
+        Jedna mrówka konstruuje jedno kompletne rozwiązanie (przypisanie produktów do półek).
+        Umieszczenia są wykonywane w ramach podanej sesji, więc wywołujący może je cofnąć.
+        `weights[prod_idx]` to wiersz wag wyboru produktu dla wszystkich półek (`PheromoneStore.weights`).
+        """
         solution = [-1] * len(batch)
         
-        product_indices = sorted(range(len(batch)), key=lambda i: batch[i].volume, reverse=True)
-        
-        for prod_idx in product_indices:
+        for prod_idx in self._placement_order:
             product = batch[prod_idx]
-            
-            shelf_probs = (pheromones[prod_idx] ** self.alpha) * (attractiveness ** self.beta)
-            
-            for shelf_idx, shelf in enumerate(temp_shelves):
-                if not shelf.find_placement_position(product.dims_in_voxels()):
-                    shelf_probs[shelf_idx] = 0
-            
-            sum_probs = np.sum(shelf_probs)
-            if sum_probs > 0:
-                shelf_probs /= sum_probs
-            else:
-                continue
+            voxel_dims = product.dims_in_voxels()
+            product_weights = weights[prod_idx]
 
-            chosen_shelf_idx = np.random.choice(len(temp_shelves), p=shelf_probs)
-            solution[prod_idx] = chosen_shelf_idx
+            # Najpierw lista kandydatów - sprawdzamy tylko k półek
+            if self._candidates is not None:
+                candidates = self._candidates[[fit_index.can_fit(int(shelf_idx), voxel_dims) for shelf_idx in self._candidates]]
+                chosen_shelf_idx = self._choose_and_place(product_weights[candidates], candidates, shelves, product, session, rng)
+                if chosen_shelf_idx != -1:
+                    solution[prod_idx] = chosen_shelf_idx
+                    continue
+            
+            shelf_probs = product_weights.copy()
             
-            temp_shelves[chosen_shelf_idx].place_product(product)
+            # Jedno zapytanie o wszystkie półki zamiast skanowania każdej z osobna
+            shelf_probs[~fit_index.fits_mask(voxel_dims)] = 0
+            solution[prod_idx] = self._choose_and_place(shelf_probs, np.arange(len(shelves)), shelves, product, session, rng)
             
         return solution
 
-    def _update_pheromones(self, pheromones: np.ndarray, ant_solutions: list):
-        """Aktualizuje macierz feromonów: parowanie i wzmacnianie."""
+    def _choose_and_place(self, shelf_probs: np.ndarray, shelf_indices: np.ndarray, shelves: list[Shelf], product: Product,
+                          session: PlacementSession, rng: np.random.Generator) -> int:
+        """
+        Losuje półkę spośród `shelf_indices` z wagami `shelf_probs` i umieszcza na niej produkt. Zwraca numer półki albo -1.
+        Maska dopasowania może być jedynie górnym ograniczeniem (np. dla punktów ekstremalnych),
+        więc półkę, na której umieszczenie się nie uda, wykluczamy i losujemy ponownie.
+        """
+        while (sum_probs := np.sum(shelf_probs)) > 0:
+            choice = int(rng.choice(len(shelf_indices), p=shelf_probs / sum_probs))
+            chosen_shelf_idx = int(shelf_indices[choice])
+            if session.place(shelves[chosen_shelf_idx], product):
+                return chosen_shelf_idx
+            shelf_probs[choice] = 0
+
+        return -1
+
+    def _update_pheromones(self, pheromones: PheromoneStore, ant_solutions: list):
+        """Aktualizuje ślad feromonowy: parowanie i wzmacnianie (jedna redukcja dla całej generacji)."""
         
-        pheromones *= (1 - self.evaporation_rate)
+        pheromones.evaporate(self.evaporation_rate)
 
-        for solution, cost, unplaced in ant_solutions:
-            if unplaced > 0: continue
+        accepted = [(solution, cost) for solution, cost, unplaced in ant_solutions if unplaced == 0]
+        if not accepted:
+            return
 
-            pheromone_deposit = self.q / (cost + 1)
-            
-            for prod_idx, shelf_idx in enumerate(solution):
-                if shelf_idx != -1:
-                    pheromones[prod_idx][shelf_idx] += pheromone_deposit
+        solutions = np.array([solution for solution, _cost in accepted], dtype=np.int64)
+        deposits = np.array([self.q / (cost + 1) for _solution, cost in accepted])
+        ants, products = np.nonzero(solutions != -1)
+        pheromones.deposit(products, solutions[ants, products], deposits[ants])
+
+        if self.pheromone_min is not None or self.pheromone_max is not None:
+            pheromones.clip(self.pheromone_min, self.pheromone_max)
 
     def _evaluate_solution(self, solution: list[int], batch: list[Product], original_shelves: list[Shelf]) -> tuple[float, int]:
-        """Ocenia koszt danego rozwiązania bez modyfikowania stanu magazynu."""
-        temp_shelves = copy.deepcopy(original_shelves)
-        total_cost = 0.0
-        unplaced_count = 0
-        
-        for prod_idx, shelf_idx in enumerate(solution):
-            if shelf_idx == -1:
-                unplaced_count += 1
-                continue
-                
-            product = batch[prod_idx]
-            shelf = temp_shelves[shelf_idx]
-            
-            if shelf.place_product(product):
-                total_cost += product.frequency * (shelf.access_cost + shelf.operational_cost)
-            else:
-                unplaced_count += 1
-                
-        return total_cost, unplaced_count
+        """Ocenia koszt danego rozwiązania bez modyfikowania stanu magazynu (umieszczenia są cofane)."""
+        if self._engine is None or self._engine.batch is not batch or self._engine.shelves is not original_shelves:
+            self._engine = PackingEngine(original_shelves, batch)
+
+        # Rozwiązanie z gwarantowanym przepełnieniem i tak jest odrzucane (unplaced > 0) - bez dokładnego pakowania
+        lower_bound, overflow = self._engine.bounds([solution])
+        if overflow[0] > 0:
+            return float(lower_bound[0]), int(overflow[0])
+
+        total_cost, unplaced = self._engine.evaluate(solution)
+        return total_cost, len(unplaced)
 
     def _apply_solution(self, solution: list[int], batch: list[Product], shelves: list[Shelf]) -> list[Product]:
         """Finalnie umieszcza produkty i ZWRACA listę tych, które się nie zmieściły."""
@@ -168,4 +306,45 @@ class AntColonyOptimizer(Optimizer):
 
     @property
     def cost(self) -> float:
-        return self._best_cost if self._best_cost != float('inf') else 0
\ No newline at end of file
+        return self._best_cost if self._best_cost != float('inf') else 0
+
+
+# Stan procesu roboczego: kolonia z półkami i produktami odtworzonymi z ostatnio opublikowanej partii
+_worker_colony: tuple | None = None
+
+def _build_ants_chunk(spec: dict, settings: dict, pheromones: PheromoneStore,
+                      ant_seeds: list[np.random.SeedSequence]) -> tuple[list[tuple[list[int], float, int]], np.ndarray]:
+    """
+    Buduje fragment mrówek generacji w procesie roboczym. Partia jest odtwarzana tylko przy zmianie bloku `spec`.
+    Zwraca rozwiązania mrówek i przyrost liczników ocen w tym procesie (patrz `_evaluation_stats`).
+    """
+    global _worker_colony
+
+    if _worker_colony is None or _worker_colony[0] != spec["name"]:
+        shelves, products = SharedBatch.attach(spec)
+        colony = AntColonyOptimizer(**settings)
+        colony._placement_order = ProductTable(products).order_by_volume()
+        colony._engine = PackingEngine(shelves, products)
+        _worker_colony = (spec["name"], colony, products, shelves, colony._prepare_heuristic(shelves), WarehouseIndex(shelves))
+
+    _name, colony, products, shelves, heuristic, fit_index = _worker_colony
+    stats_before = _evaluation_stats(colony._engine)
+    ant_solutions = colony._build_ants(ant_seeds, products, shelves, pheromones, heuristic, fit_index)
+    return ant_solutions, _evaluation_stats(colony._engine) - stats_before
+
+
+def _evaluation_stats(engine: PackingEngine) -> np.ndarray:
+    """Liczniki ocen: dokładne i przybliżone oceny silnika, trafienia i chybienia jego pamięci oraz wspólnego cache dopasowań."""
+    return np.array([
+        engine.exact_calls, engine.surrogate_calls, engine.memo.hits, engine.memo.misses, fit_cache.hits, fit_cache.misses
+    ], dtype=np.int64)
+
+def _add_evaluation_stats(engine: PackingEngine, stats: np.ndarray) -> None:
+    """Dolicza liczniki z procesu roboczego do silnika i cache dopasowań procesu głównego."""
+    exact_calls, surrogate_calls, memo_hits, memo_misses, fit_hits, fit_misses = (int(value) for value in stats)
+    engine.exact_calls += exact_calls
+    engine.surrogate_calls += surrogate_calls
+    engine.memo.hits += memo_hits
+    engine.memo.misses += memo_misses
+    fit_cache.hits += fit_hits
+    fit_cache.misses += fit_misses
@@ -0,0 +1,270 @@
+import contextlib
+import copy
+import io
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from utility.product import Product
+from utility.rack import Rack
+from utility.shelf import Shelf
+from utility.shared_batch import SharedBatch
+from utility.warehouse_tensor import shelf_costs, free_voxels
+from optimization_algorithms.optimizer import Optimizer, SearchBudget, seed_sequence_state, seed_sequence_from_state
+from optimization_algorithms.greedy import GreedyOptimizer
+
+class DecompositionOptimizer(Optimizer):
+    """
+    Meta-optymalizator: dzieli regały na `groups` grup według kosztu (kolejne progi kosztu półek,
+    o zbliżonej wolnej pojemności), przydziela produkty partii do grup tanim przebiegiem wstępnym
+    i rozwiązuje każdą podpartię optymalizatorem `optimizer` tylko na półkach jej grupy.
+    Przestrzeń przeszukiwania to suma (produkty grupy x półki grupy) zamiast (produkty x półki).
+
+    Przebieg wstępny to relaksacja z `placement_lower_bound`: produkty w kolejności malejącej gęstości
+    kosztu (częstotliwość / objętość) wypełniają grupy od najtańszej, każdą do `fill_ratio` jej wolnej
+    objętości (zapas na geometrię). Produkty, których grupa nie umieściła, trafiają do przebiegu
+    naprawczego - algorytmu zachłannego na wszystkich półkach.
+
+    Grupy są rozwiązywane równolegle w `workers` procesach (stan półek przez SharedBatch, wyniki wracają
+    jako pozycje i orientacje i są odtwarzane przez `place_product_at`). Przy ciągłej reprezentacji
+    półek albo `workers=1` grupy są rozwiązywane kolejno, bezpośrednio na półkach magazynu.
+    Optymalizator jest kopiowany do procesów roboczych, więc sam powinien działać w jednym procesie.
+
+    Każda grupa, w obu trybach, dostaje świeżą kopię `optimizer` ze swoim ziarnem (z SeedSequence tego
+    meta-optymalizatora, ustawianej przez `seed`) i stanem (`state_dict`) grupy o tym samym numerze
+    z poprzedniej partii - wynik nie zależy od tego, czy grupy działały kolejno, czy równolegle.
+    """
+
+    unplaced_penalty: float = 1_000_000
+
+    def __init__(self, optimizer: Optimizer, groups=4, fill_ratio=0.5, workers=None, seed=None, budget: SearchBudget | None = None):
+
+        if groups < 1:
+            raise ValueError(f"Number of groups must be positive, got {groups}.")
+
+        self.optimizer = optimizer
+        self.groups = groups
+        self.fill_ratio = fill_ratio
+        self.workers = workers if workers is not None else groups
+        self.seed = seed
+        self._seed_sequence: np.random.SeedSequence | None = np.random.SeedSequence(seed) if seed is not None else None
+        # Stan optymalizatora każdej grupy po ostatniej partii (np. start z poprzedniego rozwiązania)
+        self._group_states: list[dict] = []
+        self.budget = budget
+        self._repair = GreedyOptimizer()
+        self._executor: ProcessPoolExecutor | None = None
+        self._total_cost_for_batch = 0.0
+
+    def solve(self, batch: list[Product], racks: list[Rack], budget: SearchBudget | None = None):
+
+        all_shelves = [shelf for rack in racks for shelf in rack.shelves]
+        progress = self._start_search(budget, batch, all_shelves)
+        if not all_shelves:
+            print("No shelves available for placement.")
+            return list(batch)
+
+        rack_groups = self.split_racks(racks)
+        product_groups = self.allocate(batch, [[shelf for rack in group for shelf in rack.shelves] for group in rack_groups])
+        print(f"  > Starting decomposition for new batch of {len(batch)} products: {len(rack_groups)} rack groups "
+              f"({', '.join(str(len(products)) for products in product_groups)} products), solved by {self.optimizer.__class__.__name__}.")
+
+        # Grupy dostają wspólny termin i kryteria zatrzymania całego przeszukiwania
+        budget = budget if budget is not None else self.budget
+        group_budget = SearchBudget(
+            deadline=progress.deadline,
+            stall_generations=budget.stall_generations if budget is not None else None,
+            gap_tolerance=budget.gap_tolerance if budget is not None else None
+        )
+
+        # Ziarna dla wszystkich grup (także pustych) - numer grupy zawsze wyznacza to samo ziarno
+        seed_sequence = self._seed_sequence or np.random.SeedSequence(int(np.random.randint(2**32, dtype=np.uint64)))
+        group_seeds = [int(child.generate_state(1)[0]) for child in seed_sequence.spawn(len(rack_groups))]
+        tasks = [
+            (group, rack_group, products, self._group_states[group] if group < len(self._group_states) else {}, group_seeds[group])
+            for group, (rack_group, products) in enumerate(zip(rack_groups, product_groups)) if products
+        ]
+
+        continuous = any(shelf.storage.continuous for shelf in all_shelves)
+        if self.workers > 1 and len(tasks) > 1 and not continuous:
+            leftovers, generations, states = self._solve_parallel(tasks, group_budget)
+        else:
+            leftovers, generations, states = self._solve_serial(tasks, group_budget)
+
+        self._group_states = [
+            states.get(group, self._group_states[group] if group < len(self._group_states) else {}) for group in range(len(rack_groups))
+        ]
+
+        if leftovers:
+            print(f"  > Repair pass for {len(leftovers)} products on all shelves.")
+            _assignment, _cost, unplaced_products = self._repair.assign(leftovers, all_shelves)
+        else:
+            unplaced_products = []
+
+        self._total_cost_for_batch = sum(
+            product.frequency * (product.assigned_shelf.access_cost + product.assigned_shelf.operational_cost)
+            for product in batch if product.assigned_shelf is not None
+        )
+        progress.update(self._total_cost_for_batch + len(unplaced_products) * self.unplaced_penalty, generations=generations)
+
+        print(f"  > Decomposition finished. Cost for this batch: {self.cost:.2f}")
+        print(f"  > {progress.summary()}")
+        if unplaced_products:
+            print(f"  > Could not place {len(unplaced_products)} products. They will be carried over.")
+
+        return unplaced_products
+
+    def split_racks(self, racks: list[Rack]) -> list[list[Rack]]:
+        """
+        Regały uporządkowane rosnąco po najniższym koszcie półki, podzielone na co najwyżej `groups`
+        kolejnych progów kosztu o zbliżonej wolnej objętości. Grupa nie jest pusta.
+        """
+        racks = [rack for rack in racks if rack.shelves]
+        rack_costs = np.array([shelf_costs(rack.shelves).min() for rack in racks])
+        racks = [racks[i] for i in np.argsort(rack_costs, kind="stable")]
+
+        capacity = np.array([np.maximum(free_voxels(rack.shelves), 0.0).sum() for rack in racks])
+        count = min(self.groups, len(racks))
+        if count <= 1:
+            return [racks] if racks else []
+
+        # Granica grupy tam, gdzie skumulowana pojemność przekracza kolejną część całości; co najmniej jeden regał na grupę
+        ends = np.cumsum(capacity)
+        targets = ends[-1] * np.arange(1, count) / count
+        cuts = np.searchsorted(ends, targets, side="left") + 1
+        cuts = np.clip(cuts, np.arange(1, count), len(racks) - np.arange(count - 1, 0, -1))
+        cuts = np.maximum.accumulate(cuts)
+        bounds = [0, *cuts.tolist(), len(racks)]
+        return [racks[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+    def allocate(self, batch: list[Product], shelf_groups: list[list[Shelf]]) -> list[list[Product]]:
+        """
+        Przydział produktów do grup (uporządkowanych od najtańszej): malejąca gęstość kosztu wypełnia
+        kolejne grupy do `fill_ratio` ich wolnej objętości; nadmiar trafia do ostatniej grupy.
+        """
+        if not shelf_groups:
+            return []
+
+        continuous = any(shelf.storage.continuous for shelves in shelf_groups for shelf in shelves)
+        volume = np.array([
+            product.volume / product.voxel_size ** 3 if continuous else float(np.prod(product.dims_in_voxels()))
+            for product in batch
+        ])
+        frequency = np.array([product.frequency for product in batch], dtype=np.float64)
+        order = np.argsort(-frequency / np.maximum(volume, 1e-12), kind="stable")
+
+        capacity_ends = np.cumsum([self.fill_ratio * np.maximum(free_voxels(shelves), 0.0).sum() for shelves in shelf_groups])
+        # Grupa produktu to ta, w której pojemności wypada środek jego objętości
+        middles = np.cumsum(volume[order]) - volume[order] / 2
+        group_of = np.minimum(np.searchsorted(capacity_ends, middles, side="right"), len(shelf_groups) - 1)
+
+        product_groups: list[list[Product]] = [[] for _ in shelf_groups]
+        for product_idx, group in zip(order.tolist(), group_of.tolist()):
+            product_groups[group].append(batch[product_idx])
+        return product_groups
+
+    def _solve_serial(self, tasks: list[tuple], budget: SearchBudget) -> tuple[list[Product], int, dict[int, dict]]:
+        """
+        Grupy (numer, regały, produkty, stan, ziarno) rozwiązywane kolejno na żywych półkach. Zwraca produkty
+        do naprawy (w kolejności grup i produktów w grupie), najwięcej generacji grupy i stan optymalizatora każdej grupy.
+        """
+        leftovers: list[Product] = []
+        generations = 0
+        states: dict[int, dict] = {}
+        for group, rack_group, products, state, seed in tasks:
+            optimizer = _group_optimizer(self.optimizer, state, seed)
+            unplaced = {id(product) for product in optimizer.solve(products, rack_group, budget=budget) or []}
+            # Kolejność produktów grupy (jak w ścieżce równoległej), a nie kolejność zwrócona przez optymalizator
+            leftovers.extend(product for product in products if id(product) in unplaced)
+            generations = max(generations, optimizer.generations_completed)
+            states[group] = optimizer.state_dict()
+        return leftovers, generations, states
+
+    def _solve_parallel(self, tasks: list[tuple], budget: SearchBudget) -> tuple[list[Product], int, dict[int, dict]]:
+        """Grupy rozwiązywane w procesach roboczych; wyniki są odtwarzane na półkach magazynu."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        shared = [SharedBatch([shelf for rack in rack_group for shelf in rack.shelves], products) for _group, rack_group, products, _state, _seed in tasks]
+        try:
+            results = list(self._executor.map(
+                _solve_group,
+                [batch.spec for batch in shared],
+                [self.optimizer] * len(tasks),
+                [state for _group, _rack_group, _products, state, _seed in tasks],
+                [seed for _group, _rack_group, _products, _state, seed in tasks],
+                [budget] * len(tasks)
+            ))
+        finally:
+            for batch in shared:
+                batch.close()
+
+        leftovers: list[Product] = []
+        generations = 0
+        states: dict[int, dict] = {}
+        for (group, rack_group, products, _state, _seed), (placements, output, group_generations, state) in zip(tasks, results):
+            states[group] = state
+            print(output, end="")
+            shelves = [shelf for rack in rack_group for shelf in rack.shelves]
+            placed = np.zeros(len(products), dtype=bool)
+            for product_idx, shelf_idx, position, voxel_dims in placements:
+                placed[product_idx] = shelves[shelf_idx].place_product_at(products[product_idx], position, voxel_dims)
+            leftovers.extend(product for product, ok in zip(products, placed) if not ok)
+            generations = max(generations, group_generations)
+        return leftovers, generations, states
+
+    def state_dict(self) -> dict:
+
+        return {"seed_sequence": seed_sequence_state(self._seed_sequence), "group_states": self._group_states}
+
+    def load_state_dict(self, state: dict) -> None:
+
+        if state.get("seed_sequence") is not None:
+            self._seed_sequence = seed_sequence_from_state(state["seed_sequence"])
+        self._group_states = list(state.get("group_states", []))
+
+    def reseed(self, seed: int) -> None:
+
+        self.seed = seed
+        self._seed_sequence = np.random.SeedSequence(seed)
+
+    def close(self) -> None:
+        """Zamyka pulę procesów roboczych (jeśli była utworzona)."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    @property
+    def cost(self) -> float:
+        """Zwraca koszt poniesiony tylko dla ostatnio przetworzonej partii (grupy i przebieg naprawczy)."""
+        return self._total_cost_for_batch
+
+
+def _group_optimizer(optimizer: Optimizer, state: dict, seed: int) -> Optimizer:
+    """Kopia optymalizatora dla jednej grupy: stan tej grupy z poprzedniej partii i jej własne ziarno."""
+    optimizer = copy.deepcopy(optimizer)
+    optimizer.load_state_dict(state)
+    optimizer.reseed(seed)
+    return optimizer
+
+
+def _solve_group(spec: dict, optimizer: Optimizer, state: dict, seed: int, budget: SearchBudget) -> tuple[list[tuple], str, int, dict]:
+    """
+    Rozwiązuje jedną grupę w procesie roboczym na kopii jej półek. Zwraca umieszczenia
+    (indeks produktu, indeks półki, pozycja, wymiary w wokselach), wypisany przez optymalizator tekst,
+    liczbę ukończonych generacji i stan optymalizatora po rozwiązaniu.
+    """
+    optimizer = _group_optimizer(optimizer, state, seed)
+    shelves, products = SharedBatch.attach(spec)
+    rack = Rack("group", max_shelves=len(shelves))
+    for shelf in shelves:
+        rack.add_shelf(shelf)
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        optimizer.solve(products, [rack], budget=budget)
+
+    # Kolejność umieszczeń na każdej półce jak w `stored_products`, więc rodzic odtwarza te same listy co ścieżka szeregowa
+    product_index = {id(product): idx for idx, product in enumerate(products)}
+    placements = [
+        (product_index[id(product)], shelf_idx, product.position, product.voxel_dims)
+        for shelf_idx, shelf in enumerate(shelves) for product in shelf.stored_products
+    ]
+    return placements, output.getvalue(), optimizer.generations_completed, optimizer.state_dict()
@@ -1,29 +1,71 @@
-import random
-import copy
+import hashlib
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from utility.product import Product
+from utility.product_table import ProductTable
 from utility.rack import Rack
 from utility.shelf import Shelf
-from optimization_algorithms.optimizer import Optimizer
+from utility.warehouse_index import WarehouseIndex
+from utility.shared_batch import SharedBatch
+from utility.fit_cache import FitCache
+from utility.packing_engine import PackingEngine
+from optimization_algorithms.optimizer import Optimizer, SearchBudget, SearchProgress
+from optimization_algorithms.greedy import GreedyOptimizer
 
 class GeneticOptimizer(Optimizer):
 
-    def __init__(self, population_size=50, generations=100, mutation_rate=0.05, crossover_rate=0.8, tournament_size=3):
+    # Kara za każdy produkt, którego nie udało się umieścić
+    unplaced_penalty: float = 1_000_000
+
+    def __init__(self, population_size=50, generations=100, mutation_rate=0.05, crossover_rate=0.8, tournament_size=3,
+                 crossover_type="one_point", seed=None, workers=1, elite_count=0, fitness_cache_size=10_000,
+                 prescreen=False, budget=None, warm_start=False):
+        if crossover_type not in ("one_point", "uniform"):
+            raise ValueError(f"Unknown crossover type '{crossover_type}'. Available: one_point, uniform.")
+
         self.population_size = population_size
         self.generations = generations
         self.mutation_rate = mutation_rate
         self.crossover_rate = crossover_rate
         self.tournament_size = tournament_size
+        self.crossover_type = crossover_type
+        self.seed = seed
+        # Bez ziarna generator jest tworzony w `solve` z globalnego stanu np.random (powtarzalność przez np.random.seed)
+        self._rng: np.random.Generator | None = np.random.default_rng(seed) if seed is not None else None
+        # Przy workers > 1 ocena populacji idzie do puli procesów, współdzielonej między generacjami i epokami
+        self.workers = workers
+        self._executor: ProcessPoolExecutor | None = None
+        self._shared_batch: SharedBatch | None = None
+        # Najlepsi osobnicy przechodzą bez zmian do następnej generacji; ich ocena jest już w cache
+        self.elite_count = min(elite_count, population_size)
+        # Cache oceny chromosomów - ważny tylko w obrębie jednej partii (stan półek jest wtedy stały)
+        self._fitness_cache = FitCache(maxsize=fitness_cache_size)
+        self._evaluation_time = 0.0
+        # Relaksacja pojemnościowa przed dokładnym pakowaniem - tylko kandydaci, którzy mogą pobić najlepszego
+        # (domyślnie wyłączona: odrzuceni dostają zastępczą ocenę, co zmienia przebieg selekcji)
+        self.prescreen = prescreen
+        # Domyślny limit czasu/stagnacji dla każdej partii (None - zawsze pełna liczba generacji)
+        self.budget: SearchBudget | None = budget
+        # Start z rozwiązania zachłannego i najlepszego rozwiązania poprzedniej partii (product_id -> shelf_id)
+        self.warm_start = warm_start
+        self._warm_assignments: dict[str, str] = {}
         
         self._best_cost = float('inf')
         self.best_solution_ever = None
+        self._fit_index: WarehouseIndex | None = None
+        self._table: ProductTable | None = None
+        self._placement_order = None
+        self._engine: PackingEngine | None = None
 
-    def solve(self, batch: list[Product], racks: list[Rack]):
+    def solve(self, batch: list[Product], racks: list[Rack], budget: SearchBudget | None = None):
         """Główna metoda uruchamiająca ewolucję dla danej partii produktów."""
 
         self._best_cost = float('inf')
         self.best_solution_ever = None
 
         all_shelves = [shelf for rack in racks for shelf in rack.shelves]
+        progress = self._start_search(budget, batch, all_shelves)
         if not all_shelves:
             print("No shelves available for placement.")
             return
@@ -31,113 +73,362 @@ class GeneticOptimizer(Optimizer):
         num_products = len(batch)
         num_shelves = len(all_shelves)
 
-        # 1. Inicjalizacja populacji
+        self._prepare_batch(batch, all_shelves)
+        self._fitness_cache.clear()
+        self._evaluation_time = 0.0
+
+        if self.seed is None:
+            self._rng = np.random.default_rng(np.random.randint(2**32, dtype=np.uint64))
+
+        # 1. Inicjalizacja populacji - macierz (population_size, num_products) numerów półek
         population = self._initialize_population(num_products, num_shelves)
+        if self.warm_start:
+            self._seed_population(population, self._warm_start_seeds(batch, all_shelves))
 
         print(f"  > Starting GA for new batch: {self.generations} generations, {self.population_size} population size.")
 
-        for gen in range(self.generations):
-            # 2. Ewaluacja populacji
-            fitness_scores = [self._calculate_fitness(ind, batch, all_shelves) for ind in population]
+        parallel = self.workers > 1 and not any(shelf.storage.continuous for shelf in all_shelves)
+        if parallel:
+            self._shared_batch = SharedBatch(all_shelves, batch)
 
-            best_fitness_in_gen = max(fitness_scores)
-            best_cost_in_gen = 1 / best_fitness_in_gen if best_fitness_in_gen > 0 else float('inf')
-
-            if best_cost_in_gen < self._best_cost:
-                self._best_cost = best_cost_in_gen
-                best_individual_index = fitness_scores.index(best_fitness_in_gen)
-                self.best_solution_ever = population[best_individual_index]
+        try:
+            self._evolve(population, self.generations, batch, all_shelves, parallel, progress)
+        finally:
+            if self._shared_batch is not None:
+                self._shared_batch.close()
+                self._shared_batch = None
             
         # 5. Po zakończeniu ewolucji, zastosuj najlepsze znalezione rozwiązanie do PRAWDZIWYCH półek
         print(f"  > Evolution finished. Best cost for this batch: {self._best_cost:.2f}")
+        print(f"  > {progress.summary()}")
+        self._print_cache_summary()
+        return self._apply_best_solution(batch, all_shelves)
+
+    def _apply_best_solution(self, batch: list[Product], shelves: list[Shelf]) -> list[Product]:
+
         unplaced_products: list[Product] = []
-        if self.best_solution_ever:
+        if self.best_solution_ever is not None:
             _cost, unplaced_products = self._evaluate_individual(
-                self.best_solution_ever, batch, all_shelves, apply_placement=True
+                self.best_solution_ever, batch, shelves, apply_placement=True
             )
             if unplaced_products:
                 print(f"  > Could not place {len(unplaced_products)} products. They will be carried over.")
+            self._warm_assignments = {
+                product.product_id: shelves[shelf_idx].shelf_id for product, shelf_idx in zip(batch, self.best_solution_ever.tolist())
+            }
         else:
             print("  > No valid solution found for this batch. All products carried over.")
             unplaced_products = batch[:]
 
         return unplaced_products
 
-    def _initialize_population(self, num_products: int, num_shelves: int) -> list[list[int]]:
+    def _warm_start_seeds(self, batch: list[Product], shelves: list[Shelf]) -> np.ndarray:
+        """
+        Osobniki startowe: przypisania zachłanne (w kolejności częstotliwości jak `GreedyOptimizer` i w kolejności
+        umieszczania chromosomu - to drugie dekoduje się bez strat) oraz najlepsze przypisanie z poprzedniej partii
+        (dla produktów, które w niej były, dopasowane po product_id i shelf_id; pozostałe geny z przypisania zachłannego).
+        -1 oznacza gen bez podpowiedzi.
+        """
+        greedy_planner = GreedyOptimizer()
+        greedy = greedy_planner.plan(batch, shelves, self._placement_order)
+        seeds = [greedy, greedy_planner.plan(batch, shelves)]
+
+        if self._warm_assignments:
+            shelf_index = {shelf.shelf_id: i for i, shelf in enumerate(shelves)}
+            previous = np.array(
+                [shelf_index.get(self._warm_assignments.get(product.product_id), -1) for product in batch], dtype=np.int64
+            )
+            if (previous >= 0).any():
+                seeds.append(np.where(previous >= 0, previous, greedy))
+
+        return np.array(seeds, dtype=np.int64)
+
+    @staticmethod
+    def _seed_population(population: np.ndarray, seeds: np.ndarray) -> None:
+        """Zastępuje pierwsze osobniki populacji podpowiedziami; geny bez podpowiedzi pozostają losowe."""
+        count = min(len(seeds), len(population))
+        population[:count] = np.where(seeds[:count] >= 0, seeds[:count], population[:count])
+
+    def _evolve(self, population: np.ndarray, generations: int, batch: list[Product], shelves: list[Shelf], parallel: bool,
+                progress: SearchProgress | None = None, breed_last: bool = False) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Ewoluuje populację przez `generations` generacji, aktualizując najlepsze rozwiązanie.
+        Zwraca populację, od której można kontynuować, oraz ostatnią ocenioną populację z jej oceną.
+        Bez `breed_last` ostatnia generacja jest tylko oceniana (obie populacje są tym samym obiektem);
+        z `breed_last` powstaje z niej jeszcze potomstwo - odcinek ma wtedy dokładnie `generations`
+        kroków rozmnażania, a kolejny odcinek zaczyna od oceny potomstwa.
+        Ewolucja kończy się wcześniej (bez rozmnażania), gdy `progress` zgłosi przekroczenie limitu czasu lub stagnację.
+        """
+        scored = population
+        fitness_scores = np.zeros(len(population), dtype=np.float64)
+        for gen in range(generations):
+            # 2. Ewaluacja populacji
+            fitness_scores = self._population_fitness(population, batch, shelves, parallel)
+
+            best_individual_index = int(np.argmax(fitness_scores))
+            best_fitness_in_gen = fitness_scores[best_individual_index]
+            best_cost_in_gen = 1 / best_fitness_in_gen if best_fitness_in_gen > 0 else float('inf')
+
+            if best_cost_in_gen < self._best_cost:
+                self._best_cost = best_cost_in_gen
+                self.best_solution_ever = population[best_individual_index].copy()
+
+            scored = population
+            if progress is not None and progress.update(self._best_cost):
+                break
+            if gen == generations - 1 and not breed_last:
+                break
+
+            elites = population[np.argsort(-fitness_scores, kind="stable")[:self.elite_count]]
+
+            # 3. Selekcja i krzyżowanie
+            parents = self._selection(population, fitness_scores)
+            population = self._crossover(parents)
+
+            # 4. Mutacja
+            self._mutate(population, len(shelves))
+            population[:self.elite_count] = elites
+
+        return population, scored, fitness_scores
+
+    def _prepare_batch(self, batch: list[Product], shelves: list[Shelf]) -> None:
+        """Tabela produktów, kolejność umieszczania i podsumowania wolnego miejsca liczone raz na partię."""
+        self._table = ProductTable(batch)
+        self._placement_order = self._table.order_by_volume()
+        self._fit_index = WarehouseIndex(shelves)
+        self._fit_index.prepare([product.dims_in_voxels() for product in batch])
+        self._engine = PackingEngine(shelves, batch, self._placement_order, self._fit_index)
+
+    def _population_fitness(self, population: np.ndarray, batch: list[Product], shelves: list[Shelf], parallel: bool) -> np.ndarray:
+        """
+        Ocenia populację, licząc fitness tylko dla chromosomów, których nie ma w cache.
+        Powtórzenia w obrębie generacji są oceniane raz i liczone jako trafienia.
+        Przy `prescreen` chromosomy odrzucone przez ograniczenie dostają ocenę zastępczą nie wyższą niż
+        najgorsza dokładna ocena populacji; ocena zastępcza nie trafia do cache.
+        """
+        cache = self._fitness_cache
+        fitness_scores = np.empty(len(population), dtype=np.float64)
+
+        occurrences: dict[bytes, list[int]] = {}
+        for i, individual in enumerate(population):
+            occurrences.setdefault(self._chromosome_key(individual), []).append(i)
+
+        missing: list[bytes] = []
+        for key, indices in occurrences.items():
+            score = cache.get(key)
+            if score is None:
+                missing.append(key)
+                score = np.nan
+            cache.hits += len(indices) - 1
+            fitness_scores[indices] = score
+
+        if missing:
+            rows = population[[occurrences[key][0] for key in missing]]
+            start_time = time.perf_counter()
+
+            scores = np.empty(len(rows), dtype=np.float64)
+            exact = np.ones(len(rows), dtype=bool)
+            if self.prescreen and self._best_cost < float('inf'):
+                # Osobnik, którego optymistyczny koszt nie jest lepszy od najlepszego, nie jest pakowany
+                lower_bound, _overflow = self._engine.bounds(rows, penalty=self.unplaced_penalty)
+                exact = 1.0 + lower_bound < self._best_cost
+                scores[~exact] = 1.0 / (1.0 + lower_bound[~exact])
+
+            if exact.any():
+                if parallel:
+                    scores[exact] = self._parallel_fitness(rows[exact])
+                    self._engine.exact_calls += int(exact.sum())
+                else:
+                    scores[exact] = [self._calculate_fitness(ind, batch, shelves) for ind in rows[exact]]
+            self._evaluation_time += time.perf_counter() - start_time
+
+            for key, score, is_exact in zip(missing, scores, exact):
+                if is_exact:
+                    cache.put(key, float(score))
+                fitness_scores[occurrences[key]] = score
+
+            # Ograniczenie jest optymistyczne - odrzuceni nie mogą w selekcji wygrywać z ocenionymi dokładnie
+            pruned = np.concatenate([occurrences[key] for key, is_exact in zip(missing, exact) if not is_exact] or [np.empty(0, dtype=np.int64)])
+            if len(pruned):
+                exact_scores = np.delete(fitness_scores, pruned)
+                if len(exact_scores):
+                    fitness_scores[pruned] = np.minimum(fitness_scores[pruned], exact_scores.min())
+
+        return fitness_scores
+
+    @staticmethod
+    def _chromosome_key(individual: np.ndarray) -> bytes:
+
+        return hashlib.blake2b(individual.tobytes(), digest_size=16).digest()
+
+    def _print_cache_summary(self) -> None:
+
+        cache = self._fitness_cache
+        time_saved = cache.hits * self._evaluation_time / cache.misses if cache.misses else 0.0
+        print(f"  > Fitness cache: {cache.hits} hits, {cache.misses} misses ({cache.hit_rate * 100:.1f}% hit rate), ~{time_saved:.2f}s saved.")
+        print(f"  > Evaluations: {self.exact_evaluations} exact, {self.surrogate_evaluations} surrogate.")
+
+    @property
+    def exact_evaluations(self) -> int:
+        return self._engine.exact_calls if self._engine is not None else 0
+
+    @property
+    def surrogate_evaluations(self) -> int:
+        return self._engine.surrogate_calls if self._engine is not None else 0
+
+    def _parallel_fitness(self, population: np.ndarray) -> np.ndarray:
+        """Dzieli populację na fragmenty i ocenia je w puli procesów; kolejność wyników jest zachowana."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        chunks = np.array_split(population, min(len(population), self.workers * 4))
+        spec = self._shared_batch.spec
+        results = self._executor.map(_evaluate_chunk, [spec] * len(chunks), chunks)
+        return np.concatenate(list(results))
+
+    def close(self) -> None:
+        """Zamyka pulę procesów roboczych (jeśli była używana)."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _initialize_population(self, num_products: int, num_shelves: int) -> np.ndarray:
         """Tworzy losową populację początkową."""
-        population = []
-        for _ in range(self.population_size):
-            individual = [random.randint(0, num_shelves - 1) for _ in range(num_products)]
-            population.append(individual)
-        return population
+        return self._rng.integers(0, num_shelves, size=(self.population_size, num_products), dtype=np.int32)
     
-    def _selection(self, population: list[list[int]], fitness_scores: list[float]) -> list[list[int]]:
-        """Wybiera rodziców za pomocą selekcji turniejowej."""
-        parents = []
-        for _ in range(self.population_size):
-            
-            tournament_indices = random.sample(range(self.population_size), self.tournament_size)
-            
-            winner_index = max(tournament_indices, key=lambda i: fitness_scores[i])
-            parents.append(population[winner_index])
-            
-        return parents
+    def _selection(self, population: np.ndarray, fitness_scores: np.ndarray) -> np.ndarray:
+        """Wybiera rodziców za pomocą selekcji turniejowej (wszystkie turnieje naraz). Zwraca nową macierz."""
+        contestants = self._rng.integers(0, len(population), size=(len(population), self.tournament_size))
+        winners = contestants[np.arange(len(population)), np.argmax(fitness_scores[contestants], axis=1)]
+        return population[winners]
 
-    def _crossover(self, parent1: list[int], parent2: list[int]) -> tuple[list[int], list[int]]:
-        """Wykonuje krzyżowanie jednopunktowe."""
-        if len(parent1) <= 1:
-            return parent1[:], parent2[:]
-            
-        crossover_point = random.randint(1, len(parent1) - 1)
-        
-        child1 = parent1[:crossover_point] + parent2[crossover_point:]
-        child2 = parent2[:crossover_point] + parent1[crossover_point:]
-        
-        return child1, child2
+    def _crossover(self, parents: np.ndarray) -> np.ndarray:
+        """
+        Krzyżuje w miejscu pary rodziców: i-tego z pierwszej połowy z i-tym z drugiej
+        (rodzice z turniejów są już w losowej kolejności). Krzyżowanie jednopunktowe lub
+        równomierne zależnie od `crossover_type`; przy nieparzystej liczebności ostatni osobnik przechodzi bez zmian.
+        """
+        num_pairs, num_genes = len(parents) // 2, parents.shape[1]
+        if num_pairs == 0 or num_genes <= 1:
+            return parents
 
-    def _mutate(self, individual: list[int], num_shelves: int):
-        """Losowo zmienia geny w chromosomie (przypisania do półek)."""
-        for i in range(len(individual)):
-            if random.random() < self.mutation_rate:
-                individual[i] = random.randint(0, num_shelves - 1)
+        first, second = parents[:num_pairs], parents[num_pairs:2 * num_pairs]
+        crossed = self._rng.random(num_pairs) < self.crossover_rate
 
+        if self.crossover_type == "uniform":
+            random_bits = self._rng.integers(0, 256, size=(num_pairs, (num_genes + 7) // 8), dtype=np.uint8)
+            swap = np.unpackbits(random_bits, axis=1, count=num_genes).view(bool)
+            swap[~crossed] = False
+        else:
+            # Maska genów od punktu krzyżowania do końca; punkt = num_genes oznacza brak krzyżowania.
+            # Indeksy w najmniejszym typie mieszczącym num_genes - porównanie jest wtedy najtańsze.
+            crossover_points = self._rng.integers(1, num_genes, size=num_pairs)
+            crossover_points[~crossed] = num_genes
+            index_dtype = np.min_scalar_type(num_genes)
+            swap = np.arange(num_genes, dtype=index_dtype)[None, :] >= crossover_points.astype(index_dtype)[:, None]
+
+        # Zamiana genów wskazanych maską bez tablic pośrednich na całą populację: a ^= d, b ^= d
+        difference = np.bitwise_xor(first, second)
+        difference *= swap
+        first ^= difference
+        second ^= difference
+        return parents
+
+    def _mutate(self, population: np.ndarray, num_shelves: int) -> None:
+        """
+        Losowo zmienia geny (przypisania do półek) w całej populacji, w miejscu.
+        Zamiast losować liczbę dla każdego genu, losujemy liczbę mutacji z rozkładu dwumianowego i ich pozycje.
+        """
+        genes = population.reshape(-1)
+        num_mutations = self._rng.binomial(genes.size, self.mutation_rate)
+        positions = self._rng.integers(0, genes.size, size=num_mutations)
+        genes[positions] = self._rng.integers(0, num_shelves, size=num_mutations, dtype=genes.dtype)
 
-    def _calculate_fitness(self, individual: list[int], batch: list[Product], original_shelves: list[Shelf]) -> float:
+
+    def _calculate_fitness(self, individual: np.ndarray, batch: list[Product], original_shelves: list[Shelf]) -> float:
         """Oblicza wartość fitness dla danego osobnika (rozwiązania)."""
         cost, unplaced_list = self._evaluate_individual(individual, batch, original_shelves)
         unplaced_count = len(unplaced_list)
-        penalty = unplaced_count * 1_000_000 
+        penalty = unplaced_count * self.unplaced_penalty 
         total_cost = cost + penalty
         
         return 1.0 / (1.0 + total_cost)
 
-    def _evaluate_individual(self, individual: list[int], batch: list[Product], original_shelves: list[Shelf], apply_placement: bool = False) -> tuple[float, list[Product]]:
+    def _evaluate_individual(self, individual: np.ndarray, batch: list[Product], original_shelves: list[Shelf], apply_placement: bool = False) -> tuple[float, list[Product]]:
         """
         Symuluje umieszczanie produktów i oblicza koszt.
+        Bez `apply_placement` ocena idzie przez PackingEngine - przepakowywane są tylko półki
+        z nowym zestawem produktów, a próbne umieszczenia zostają cofnięte.
         """
-        
-        if apply_placement:
-            shelves_to_use = original_shelves
-        else:
-            shelves_to_use = copy.deepcopy(original_shelves)
+        if not apply_placement:
+            if self._engine is None or self._engine.batch is not batch or self._engine.shelves is not original_shelves:
+                self._prepare_batch(batch, original_shelves)
+            return self._engine.evaluate(individual)
+
+        if self._fit_index is None:
+            self._fit_index = WarehouseIndex(original_shelves)
+        fit_index = self._fit_index
 
         total_cost = 0.0
         unplaced_products_list: list[Product] = []
 
-        sorted_indices = sorted(range(len(batch)), key=lambda i: batch[i].volume, reverse=True)
+        if self._table is None or self._table.products is not batch:
+            self._table = ProductTable(batch)
+            self._placement_order = self._table.order_by_volume()
 
-        for i in sorted_indices:
+        shelf_indices = np.asarray(individual).tolist()
+        for i in self._placement_order:
             product = batch[i]
-            shelf_index = individual[i]
-            shelf = shelves_to_use[shelf_index]
+            shelf_index = shelf_indices[i]
+            shelf = original_shelves[shelf_index]
 
-            if shelf.place_product(product):
+            if fit_index.can_fit(shelf_index, product.dims_in_voxels(), refresh=False) and shelf.place_product(product):
                 total_cost += product.frequency * (shelf.access_cost + shelf.operational_cost)
             else:
                 unplaced_products_list.append(product)
         
         return total_cost, unplaced_products_list
 
+    def state_dict(self) -> dict:
+        # Bez ziarna generator powstaje w `solve` z np.random, którego stan zapisuje sam punkt kontrolny
+        return {
+            "rng": self._rng.bit_generator.state if self.seed is not None else None,
+            "warm_assignments": dict(self._warm_assignments),
+        }
+
+    def load_state_dict(self, state: dict) -> None:
+
+        if state.get("rng") is not None and self._rng is not None:
+            self._rng.bit_generator.state = state["rng"]
+        self._warm_assignments = dict(state.get("warm_assignments", {}))
+
+    def reseed(self, seed: int) -> None:
+
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+
     @property
     def cost(self) -> float:
-        return self._best_cost
\ No newline at end of file
+        return self._best_cost
+
+
+# Stan procesu roboczego: półki i produkty odtworzone z ostatnio opublikowanej partii
+_worker_batch: tuple[str, GeneticOptimizer, list[Product], list[Shelf]] | None = None
+
+def _attach_worker_batch(spec: dict, settings: dict | None = None) -> tuple[GeneticOptimizer, list[Product], list[Shelf]]:
+    """Odtwarza partię w procesie roboczym tylko przy zmianie bloku `spec`."""
+    global _worker_batch
+
+    if _worker_batch is None or _worker_batch[0] != spec["name"]:
+        shelves, products = SharedBatch.attach(spec)
+        evaluator = GeneticOptimizer(**(settings or {}))
+        evaluator._prepare_batch(products, shelves)
+        _worker_batch = (spec["name"], evaluator, products, shelves)
+
+    _name, evaluator, products, shelves = _worker_batch
+    return evaluator, products, shelves
+
+def _evaluate_chunk(spec: dict, individuals: np.ndarray) -> np.ndarray:
+    """Ocena fragmentu populacji w procesie roboczym."""
+    evaluator, products, shelves = _attach_worker_batch(spec)
+    return np.array([evaluator._calculate_fitness(individual, products, shelves) for individual in individuals])
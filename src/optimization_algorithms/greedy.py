@@ -1,7 +1,12 @@
+import numpy as np
+from typing import Callable
 from utility.product import Product
+from utility.product_table import ProductTable
 from utility.rack import Rack
 from utility.shelf import Shelf
-from optimization_algorithms.optimizer import Optimizer
+from utility.placement_session import PlacementSession
+from utility.shelf_cost_index import ShelfCostIndex
+from optimization_algorithms.optimizer import Optimizer, SearchBudget
 
 class GreedyOptimizer(Optimizer):
     """
@@ -11,10 +16,13 @@ class GreedyOptimizer(Optimizer):
     
     def __init__(self):
         self._total_cost_for_batch = 0.0
+        # Półki w kolejności kosztu z agregatami wolnego miejsca - żyją między epokami
+        self._cost_index: ShelfCostIndex | None = None
 
-    def solve(self, batch: list[Product], racks: list[Rack]):
+    def solve(self, batch: list[Product], racks: list[Rack], budget: SearchBudget | None = None):
         """
         Rozmieszcza produkty z partii na już częściowo zapełnionych półkach.
+        Algorytm jest jednoprzebiegowy, więc `budget` jest ignorowany.
         
         Strategia:
         1. Posortuj nowe produkty według priorytetu (np. malejąca częstotliwość).
@@ -23,30 +31,10 @@ class GreedyOptimizer(Optimizer):
            umieść go na pierwszej (najtańszej) półce, która ma wystarczająco 
            dużo wolnego miejsca.
         """
-        self._total_cost_for_batch = 0.0
-        
-        sorted_products = sorted(batch, key=lambda p: p.frequency, reverse=True)
-        
         all_shelves: list[Shelf] = [shelf for rack in racks for shelf in rack.shelves]
-        
-        sorted_shelves = sorted(all_shelves, key=lambda s: s.access_cost + s.operational_cost)
-        
-        unplaced_products: list[Product] = []
         print(f"  > Starting Greedy Optimizer for new batch of {len(batch)} products.")
 
-        for product in sorted_products:
-            placed = False
-            for shelf in sorted_shelves:
-                
-                if shelf.place_product(product):
-                    
-                    cost_for_product = product.frequency * (shelf.access_cost + shelf.operational_cost)
-                    self._total_cost_for_batch += cost_for_product
-                    placed = True
-                    break
-            
-            if not placed:
-                unplaced_products.append(product)
+        _assignment, self._total_cost_for_batch, unplaced_products = self.assign(batch, all_shelves)
 
         print(f"  > Greedy Optimizer finished. Cost for this batch: {self.cost:.2f}")
         if unplaced_products:
@@ -54,6 +42,65 @@ class GreedyOptimizer(Optimizer):
             
         return unplaced_products
 
+    def assign(self, batch: list[Product], shelves: list[Shelf], order: np.ndarray | None = None) -> tuple[np.ndarray, float, list[Product]]:
+        """
+        Umieszcza produkty na półkach (zmieniając stan magazynu), bez komunikatów i bez zmiany `cost`:
+        zwraca przypisanie (`assignment[i]` - numer półki z `shelves` albo -1), koszt i nieumieszczone produkty.
+        """
+        return self._assign(batch, shelves, lambda shelf, product: shelf.place_product(product), order)
+
+    def plan(self, batch: list[Product], shelves: list[Shelf], order: np.ndarray | None = None) -> np.ndarray:
+        """
+        Przypisanie zachłanne bez zmiany stanu magazynu (umieszczenia są cofane):
+        `plan[i]` to numer półki z `shelves` dla produktu `batch[i]` albo -1.
+        `order` - kolejność umieszczania produktów (domyślnie malejąca częstotliwość).
+        """
+        with PlacementSession() as session:
+            assignment, _cost, _unplaced = self._assign(batch, shelves, session.place, order)
+        return assignment
+
+    def _assign(self, batch: list[Product], shelves: list[Shelf], place: Callable[[Shelf, Product], bool],
+                order: np.ndarray | None = None) -> tuple[np.ndarray, float, list[Product]]:
+        """Umieszcza produkty funkcją `place`; zwraca przypisanie, koszt i nieumieszczone produkty (w kolejności prób)."""
+        if order is None:
+            order = ProductTable(batch).order_by_frequency()
+        cost_index = self._shelf_index(shelves)
+        continuous = any(shelf.storage.continuous for shelf in shelves)
+
+        assignment = np.full(len(batch), -1, dtype=np.int64)
+        total_cost = 0.0
+        unplaced_products: list[Product] = []
+
+        for product_idx in order:
+            product = batch[product_idx]
+            voxel_dims = product.dims_in_voxels()
+            volume = product.volume / product.voxel_size ** 3 if continuous else float(np.prod(voxel_dims))
+
+            # Półki, na których produkt na pewno się nie zmieści, są pomijane bez skanowania
+            position = cost_index.first_fit(voxel_dims, volume)
+            while position != -1:
+                shelf = cost_index.sorted_shelves[position]
+                
+                if place(shelf, product):
+                    
+                    cost_index.refresh(position)
+                    total_cost += product.frequency * (shelf.access_cost + shelf.operational_cost)
+                    assignment[product_idx] = cost_index.order[position]
+                    break
+                position = cost_index.first_fit(voxel_dims, volume, position + 1)
+            else:
+                unplaced_products.append(product)
+
+        return assignment, total_cost, unplaced_products
+
+    def _shelf_index(self, shelves: list[Shelf]) -> ShelfCostIndex:
+        """Indeks półek utrzymywany między wywołaniami; budowany od nowa tylko dla innego zbioru półek."""
+        if self._cost_index is None or not self._cost_index.covers(shelves):
+            self._cost_index = ShelfCostIndex(shelves)
+        else:
+            self._cost_index.sync()
+        return self._cost_index
+
     @property
     def cost(self) -> float:
         """Zwraca koszt poniesiony tylko dla ostatnio przetworzonej partii."""
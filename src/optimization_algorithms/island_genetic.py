@@ -0,0 +1,192 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from utility.product import Product
+from utility.rack import Rack
+from utility.shelf import Shelf
+from utility.shared_batch import SharedBatch
+from optimization_algorithms.optimizer import SearchBudget, SearchProgress
+from optimization_algorithms.genetic import GeneticOptimizer, _attach_worker_batch
+
+class IslandGeneticOptimizer(GeneticOptimizer):
+    """
+    Model wyspowy algorytmu genetycznego: `islands` niezależnych populacji (każda o rozmiarze
+    `population_size`) ewoluuje w osobnych procesach, a co `migration_interval` generacji
+    najlepsze ocenione osobniki (`migration_size`) migrują między wyspami według topologii
+    "ring" (do następnej wyspy) lub "full" (do wszystkich pozostałych), zastępując część potomstwa.
+    Każdy odcinek między migracjami to dokładnie `migration_interval` kroków rozmnażania.
+    Limit czasu obowiązuje każdą wyspę osobno, a stagnacja jest liczona dla najlepszego wyniku wszystkich wysp.
+    """
+
+    def __init__(self, islands=4, migration_interval=10, migration_size=2, topology="ring", workers=None, **kwargs):
+        if topology not in ("ring", "full"):
+            raise ValueError(f"Unknown migration topology '{topology}'. Available: ring, full.")
+
+        super().__init__(workers=workers if workers is not None else islands, **kwargs)
+        self.islands = islands
+        self.migration_interval = migration_interval
+        self.migration_size = migration_size
+        self.topology = topology
+
+    def solve(self, batch: list[Product], racks: list[Rack], budget: SearchBudget | None = None):
+
+        self._best_cost = float('inf')
+        self.best_solution_ever = None
+
+        all_shelves = [shelf for rack in racks for shelf in rack.shelves]
+        progress = self._start_search(budget, batch, all_shelves)
+        if not all_shelves:
+            print("No shelves available for placement.")
+            return
+
+        self._prepare_batch(batch, all_shelves)
+        self._fitness_cache.clear()
+        self._evaluation_time = 0.0
+
+        # Każda wyspa ma własny, niezależny strumień liczb losowych
+        seed = self.seed if self.seed is not None else np.random.randint(2**32, dtype=np.uint64)
+        island_rngs = [np.random.default_rng(child) for child in np.random.SeedSequence(int(seed)).spawn(self.islands)]
+        populations = []
+        for rng in island_rngs:
+            self._rng = rng
+            populations.append(self._initialize_population(len(batch), len(all_shelves)))
+        if self.warm_start:
+            seeds = self._warm_start_seeds(batch, all_shelves)
+            for population in populations:
+                self._seed_population(population, seeds)
+
+        print(f"  > Starting island GA for new batch: {self.islands} islands x {self.population_size} individuals, "
+              f"{self.generations} generations, migration every {self.migration_interval} ({self.topology}).")
+
+        parallel = self.workers > 1 and not any(shelf.storage.continuous for shelf in all_shelves)
+        if parallel:
+            self._shared_batch = SharedBatch(all_shelves, batch)
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        try:
+            remaining = self.generations
+            while remaining > 0:
+                generations = min(self.migration_interval, remaining)
+                remaining -= generations
+                # Przed migracją ostatnia generacja odcinka też się rozmnaża - migranci trafiają do potomstwa
+                breed_last = remaining > 0
+
+                if parallel:
+                    results = list(self._executor.map(
+                        _evolve_island,
+                        [self._shared_batch.spec] * self.islands,
+                        [self._island_settings()] * self.islands,
+                        populations,
+                        [generations] * self.islands,
+                        [rng.bit_generator.state for rng in island_rngs],
+                        [self._best_cost] * self.islands,
+                        [progress.deadline] * self.islands,
+                        [breed_last] * self.islands
+                    ))
+                else:
+                    results = [
+                        self._evolve_locally(population, generations, rng, batch, all_shelves, progress.deadline, breed_last)
+                        for population, rng in zip(populations, island_rngs)
+                    ]
+
+                populations, scored_populations, fitness_scores, completed = [], [], [], []
+                for rng, (population, scored, fitness, best_individual, best_cost, rng_state, island_generations) in zip(island_rngs, results):
+                    rng.bit_generator.state = rng_state
+                    populations.append(population)
+                    scored_populations.append(scored)
+                    fitness_scores.append(fitness)
+                    completed.append(island_generations)
+                    if best_cost < self._best_cost:
+                        self._best_cost = best_cost
+                        self.best_solution_ever = best_individual
+
+                if progress.update(self._best_cost, generations=min(completed)):
+                    break
+                if remaining > 0:
+                    self._migrate(populations, scored_populations, fitness_scores)
+        finally:
+            if self._shared_batch is not None:
+                self._shared_batch.close()
+                self._shared_batch = None
+
+        print(f"  > Evolution finished. Best cost for this batch: {self._best_cost:.2f}")
+        print(f"  > {progress.summary()}")
+        return self._apply_best_solution(batch, all_shelves)
+
+    def _island_settings(self) -> dict:
+        """Parametry ewolucji przekazywane do procesów roboczych."""
+        return {
+            "population_size": self.population_size,
+            "mutation_rate": self.mutation_rate,
+            "crossover_rate": self.crossover_rate,
+            "tournament_size": self.tournament_size,
+            "crossover_type": self.crossover_type,
+            "elite_count": self.elite_count,
+            "prescreen": self.prescreen,
+        }
+
+    def _evolve_locally(self, population: np.ndarray, generations: int, rng: np.random.Generator,
+                        batch: list[Product], shelves: list[Shelf], deadline: float | None = None, breed_last: bool = False) -> tuple:
+        """Ewolucja jednej wyspy w bieżącym procesie (na żywych półkach) - ten sam wynik co `_evolve_island`."""
+        best_cost, best_solution = self._best_cost, self.best_solution_ever
+        self.best_solution_ever = None
+        self._fitness_cache.clear()
+        self._rng = rng
+
+        island_progress = SearchProgress(SearchBudget(deadline=deadline))
+        population, scored, fitness = self._evolve(population, generations, batch, shelves, parallel=False,
+                                                   progress=island_progress, breed_last=breed_last)
+        result = (population, scored, fitness, self.best_solution_ever, self._best_cost, rng.bit_generator.state,
+                  island_progress.generations_completed)
+
+        self._best_cost, self.best_solution_ever = best_cost, best_solution
+        return result
+
+    def _migrate(self, populations: list[np.ndarray], scored_populations: list[np.ndarray], fitness_scores: list[np.ndarray]) -> None:
+        """
+        Najlepsze ocenione osobniki każdej wyspy (z `scored_populations`) zastępują w miejscu osobniki
+        populacji `populations` wysp docelowych: najsłabsze, jeśli populacja jest oceniona, a w przeciwnym razie
+        ostatnie osobniki potomstwa (losowa kolejność po selekcji turniejowej; elity na początku pozostają).
+        """
+        num_islands = len(populations)
+        ranking = [np.argsort(-fitness, kind="stable") for fitness in fitness_scores]
+        emigrants = [scored[order[:self.migration_size]].copy() for scored, order in zip(scored_populations, ranking)]
+
+        for target in range(num_islands):
+            if self.topology == "ring":
+                sources = [(target - 1) % num_islands]
+            else:
+                sources = [source for source in range(num_islands) if source != target]
+
+            immigrants = np.concatenate([emigrants[source] for source in sources])
+            if populations[target] is scored_populations[target]:
+                replaced = ranking[target]
+            else:
+                replaced = np.arange(min(self.elite_count, len(populations[target]) - 1), len(populations[target]))
+            immigrants = immigrants[:min(len(populations[target]) - 1, len(replaced))]
+            if len(immigrants):
+                populations[target][replaced[-len(immigrants):]] = immigrants
+
+
+def _evolve_island(spec: dict, settings: dict, population: np.ndarray, generations: int, rng_state: dict, best_cost: float,
+                   deadline: float | None = None, breed_last: bool = False) -> tuple:
+    """
+    Ewolucja jednej wyspy w procesie roboczym. Zwraca populację do kontynuacji (potomstwo przy `breed_last`),
+    ostatnią ocenioną populację z jej oceną, najlepszego osobnika
+    wyspy w tym odcinku, jego koszt, stan generatora (kolejny odcinek kontynuuje ten sam strumień)
+    i liczbę ukończonych generacji (mniejszą niż `generations`, jeśli minął `deadline`).
+    """
+    evaluator, products, shelves = _attach_worker_batch(spec, settings)
+
+    # Cache ocen jest czyszczony na każdy odcinek - wynik nie zależy od tego, który proces dostał wyspę
+    evaluator._fitness_cache.clear()
+    evaluator._rng = np.random.default_rng()
+    evaluator._rng.bit_generator.state = rng_state
+    # Najlepszy koszt ze wszystkich wysp zaostrza wstępną selekcję, ale nie jest nadpisywany przez gorsze wyniki
+    evaluator._best_cost, evaluator.best_solution_ever = best_cost, None
+
+    progress = SearchProgress(SearchBudget(deadline=deadline))
+    population, scored, fitness = evaluator._evolve(population, generations, products, shelves, parallel=False,
+                                                    progress=progress, breed_last=breed_last)
+    return (population, scored, fitness, evaluator.best_solution_ever, evaluator._best_cost, evaluator._rng.bit_generator.state,
+            progress.generations_completed)
@@ -0,0 +1,215 @@
+import numpy as np
+from utility.product import Product
+from utility.rack import Rack
+from utility.shelf import Shelf
+from utility.placement_session import PlacementSession
+from utility.warehouse_tensor import shelf_costs
+from optimization_algorithms.optimizer import SearchBudget
+from optimization_algorithms.greedy import GreedyOptimizer
+
+class LocalSearchOptimizer(GreedyOptimizer):
+    """
+    Przeszukiwanie lokalne (symulowane wyżarzanie z listą tabu) startujące z rozwiązania zachłannego.
+    Sąsiedztwa: przeniesienie produktu partii na inną półkę, zamiana półek dwóch produktów partii
+    i wstawienie produktu nieumieszczonego. Zmiana kosztu ruchu to częstotliwość x różnica kosztów półek,
+    liczona bez przepakowania - stan magazynu zmieniają tylko ruchy przyjęte, i tylko na dwóch półkach
+    (sprawdzenie, czy produkt się zmieści, odbywa się w sesji cofanej, gdy ruch się nie uda).
+
+    Generacja to `moves_per_generation` prób ruchu (domyślnie liczba produktów partii), po niej
+    temperatura maleje o czynnik `cooling_rate`. Produkt przeniesiony ruchem jest zablokowany przez
+    `tabu_tenure` kolejnych prób, chyba że ruch daje nowy najlepszy koszt.
+    """
+
+    unplaced_penalty: float = 1_000_000
+
+    def __init__(self, generations=100, moves_per_generation=None, swap_rate=0.5, initial_temperature=None, cooling_rate=0.95,
+                 tabu_tenure=10, seed=None, budget: SearchBudget | None = None):
+
+        super().__init__()
+        self.generations = generations
+        self.moves_per_generation = moves_per_generation
+        self.swap_rate = swap_rate
+        self.initial_temperature = initial_temperature
+        self.cooling_rate = cooling_rate
+        self.tabu_tenure = tabu_tenure
+        self.seed = seed
+        self.budget = budget
+        self._rng = np.random.default_rng(seed)
+        self._tracked_cost: float = 0.0
+
+    def solve(self, batch: list[Product], racks: list[Rack], budget: SearchBudget | None = None):
+
+        all_shelves: list[Shelf] = [shelf for rack in racks for shelf in rack.shelves]
+        progress = self._start_search(budget, batch, all_shelves)
+        print(f"  > Starting Local Search for new batch of {len(batch)} products.")
+
+        assignment, self._total_cost_for_batch, unplaced = self.assign(batch, all_shelves)
+        cost_index = self._cost_index
+        greedy_cost = self._total_cost_for_batch + len(unplaced) * self.unplaced_penalty
+
+        # Półki są identyfikowane pozycją w kolejności kosztu (jak w indeksie półek)
+        rank = np.empty(len(all_shelves), dtype=np.int64)
+        rank[cost_index.order] = np.arange(len(all_shelves))
+        costs = shelf_costs(all_shelves)[cost_index.order]
+        located = np.where(assignment >= 0, rank[np.maximum(assignment, 0)], -1)
+        frequency = np.array([product.frequency for product in batch], dtype=np.float64)
+        continuous = any(shelf.storage.continuous for shelf in all_shelves)
+        volume = np.array([
+            product.volume / product.voxel_size ** 3 if continuous else float(np.prod(product.dims_in_voxels()))
+            for product in batch
+        ])
+
+        current_cost = greedy_cost
+        best_cost, best_layout = current_cost, self._layout(batch)
+        temperature = self.initial_temperature
+        if temperature is None:
+            # Połowa zmiany kosztu typowego produktu przy przejściu o najmniejszy krok kosztu półek
+            steps = np.diff(np.unique(costs))
+            temperature = 0.5 * float(np.mean(frequency)) * float(steps.min()) if len(batch) and len(steps) else 0.0
+        tabu_until = np.zeros(len(batch), dtype=np.int64)
+        moves = self.moves_per_generation or len(batch)
+        attempt = 0
+
+        for _generation in range(self.generations if len(batch) and len(all_shelves) else 0):
+            for _move in range(moves):
+                attempt += 1
+                product_idx = int(self._rng.integers(len(batch)))
+                source = located[product_idx]
+
+                if source == -1:
+                    move = self._insert_move(product_idx, batch, cost_index, volume)
+                elif self._rng.random() < self.swap_rate:
+                    move = self._swap_move(product_idx, located, frequency, costs)
+                else:
+                    move = self._relocate_move(product_idx, batch, located, frequency, costs, cost_index, volume)
+                if move is None:
+                    continue
+
+                delta, changes = move
+                if not self._accept(delta, current_cost, best_cost, temperature, [tabu_until[idx] > attempt for idx, _target in changes]):
+                    continue
+                if not self._apply(changes, batch, located, cost_index):
+                    continue
+
+                current_cost += delta
+                for idx, target in changes:
+                    located[idx] = target
+                    tabu_until[idx] = attempt + self.tabu_tenure
+
+            if current_cost < best_cost:
+                best_cost, best_layout = current_cost, self._layout(batch)
+            temperature *= self.cooling_rate
+            if progress.update(best_cost):
+                break
+
+        self._tracked_cost = best_cost
+        if current_cost > best_cost:
+            self._restore(batch, best_layout)
+        # Koszt raportowany z rozmieszczenia, a nie z sumy zmian ruchów (bez kumulacji błędów zaokrągleń)
+        unplaced_products = [product for product in batch if product.assigned_shelf is None]
+        self._total_cost_for_batch = self.batch_cost(batch) - len(unplaced_products) * self.unplaced_penalty
+
+        print(f"  > Local Search finished. Cost for this batch: {self.cost:.2f} (greedy start: {greedy_cost:.2f})")
+        print(f"  > {progress.summary()}")
+        if unplaced_products:
+            print(f"  > Could not place {len(unplaced_products)} products. They will be carried over.")
+
+        return unplaced_products
+
+    @property
+    def tracked_cost(self) -> float:
+        """Najlepszy koszt partii (z karą) śledzony w ostatnim przeszukiwaniu jako koszt startowy plus suma zmian ruchów."""
+        return self._tracked_cost
+
+    def state_dict(self) -> dict:
+
+        return {"rng": self._rng.bit_generator.state}
+
+    def load_state_dict(self, state: dict) -> None:
+
+        if state.get("rng") is not None:
+            self._rng.bit_generator.state = state["rng"]
+
+    def reseed(self, seed: int) -> None:
+
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+
+    def _relocate_move(self, product_idx: int, batch: list[Product], located: np.ndarray, frequency: np.ndarray,
+                       costs: np.ndarray, cost_index, volume: np.ndarray) -> tuple | None:
+        """Przeniesienie na półkę, na której produkt może się zmieścić, szukaną od losowej pozycji w kolejności kosztu."""
+        source = located[product_idx]
+        target = cost_index.first_fit(batch[product_idx].dims_in_voxels(), volume[product_idx], int(self._rng.integers(len(costs))))
+        if target == -1 or target == source:
+            return None
+        return frequency[product_idx] * (costs[target] - costs[source]), [(product_idx, target)]
+
+    def _swap_move(self, product_idx: int, located: np.ndarray, frequency: np.ndarray, costs: np.ndarray) -> tuple | None:
+        """Zamiana półek z losowym innym produktem partii."""
+        other_idx = int(self._rng.integers(len(located)))
+        source, target = located[product_idx], located[other_idx]
+        if target == -1 or target == source:
+            return None
+        delta = (frequency[product_idx] - frequency[other_idx]) * (costs[target] - costs[source])
+        return delta, [(product_idx, target), (other_idx, source)]
+
+    def _insert_move(self, product_idx: int, batch: list[Product], cost_index, volume: np.ndarray) -> tuple | None:
+        """Wstawienie nieumieszczonego produktu na najtańszą półkę, na której może się zmieścić."""
+        target = cost_index.first_fit(batch[product_idx].dims_in_voxels(), volume[product_idx])
+        if target == -1:
+            return None
+        cost = cost_index.sorted_shelves[target].access_cost + cost_index.sorted_shelves[target].operational_cost
+        return batch[product_idx].frequency * cost - self.unplaced_penalty, [(product_idx, target)]
+
+    def _accept(self, delta: float, current_cost: float, best_cost: float, temperature: float, tabu: list[bool]) -> bool:
+        """Kryterium wyżarzania; ruchy produktów z listy tabu tylko wtedy, gdy dają nowy najlepszy koszt."""
+        if any(tabu) and current_cost + delta >= best_cost:
+            return False
+        if delta <= 0:
+            return True
+        return temperature > 0 and self._rng.random() < np.exp(-delta / temperature)
+
+    def _apply(self, changes: list[tuple[int, int]], batch: list[Product], located: np.ndarray, cost_index) -> bool:
+        """
+        Wykonuje ruch: zdejmuje produkty z ich półek i umieszcza na docelowych. Jeśli któryś się
+        nie zmieści, sesja przywraca obie półki. Po udanym ruchu agregaty obu półek są przeliczane.
+        """
+        touched = {position for idx, target in changes for position in (located[idx], target) if position != -1}
+        with PlacementSession() as session:
+            for idx, _target in changes:
+                if located[idx] != -1:
+                    session.remove(cost_index.sorted_shelves[located[idx]], batch[idx])
+            if not all(session.place(cost_index.sorted_shelves[target], batch[idx]) for idx, target in changes):
+                return False
+            session.commit()
+
+        for position in touched:
+            cost_index.refresh(int(position))
+        return True
+
+    def batch_cost(self, batch: list[Product]) -> float:
+        """Koszt partii przeliczony od zera z aktualnego rozmieszczenia (z karą za produkty nieumieszczone)."""
+        return sum(
+            product.frequency * (product.assigned_shelf.access_cost + product.assigned_shelf.operational_cost)
+            if product.assigned_shelf is not None else self.unplaced_penalty
+            for product in batch
+        )
+
+    @staticmethod
+    def _layout(batch: list[Product]) -> list[tuple]:
+        """Położenie produktów partii: (półka, pozycja, wymiary w wokselach) albo None."""
+        return [
+            (product.assigned_shelf, product.position, product.voxel_dims) if product.assigned_shelf is not None else None
+            for product in batch
+        ]
+
+    def _restore(self, batch: list[Product], layout: list[tuple]) -> None:
+        """Przywraca zapisane położenie produktów partii (pozostałe produkty nie były przenoszone)."""
+        for product in batch:
+            if product.assigned_shelf is not None:
+                product.assigned_shelf.remove_product(product)
+        for product, placement in zip(batch, layout):
+            if placement is not None:
+                shelf, position, voxel_dims = placement
+                shelf.place_product_at(product, position, voxel_dims)
+        self._cost_index.sync()
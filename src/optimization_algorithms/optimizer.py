@@ -1,11 +1,132 @@
 import abc
+import time
+import numpy as np
 from utility.product import Product
 from utility.rack import Rack
+from utility.shelf import Shelf
+from utility.lower_bound import placement_lower_bound
+
+class SearchBudget:
+    """
+    Ograniczenie jednego wywołania `solve`: `time_limit` - sekundy od startu przeszukiwania,
+    `deadline` - bezwzględny moment zakończenia (wartość `time.monotonic()`, wspólna dla procesów),
+    `stall_generations` - liczba kolejnych generacji bez poprawy najlepszego kosztu,
+    `gap_tolerance` - względna odległość najlepszego kosztu od dolnego ograniczenia partii (np. 0.05).
+    Osiągnięcie dowolnego z nich kończy przeszukiwanie z najlepszym dotąd rozwiązaniem.
+    """
+
+    def __init__(self, time_limit: float | None = None, deadline: float | None = None, stall_generations: int | None = None,
+                 gap_tolerance: float | None = None):
+
+        self.time_limit: float | None = time_limit
+        self.deadline: float | None = deadline
+        self.stall_generations: int | None = stall_generations
+        self.gap_tolerance: float | None = gap_tolerance
+
+    def deadline_from(self, start: float) -> float | None:
+        """Najwcześniejszy z limitów czasu dla przeszukiwania rozpoczętego w chwili `start`."""
+        deadlines = [d for d in (self.deadline, start + self.time_limit if self.time_limit is not None else None) if d is not None]
+        return min(deadlines) if deadlines else None
+
+
+class SearchProgress:
+    """Przebieg jednego przeszukiwania: liczba ukończonych generacji, powód zatrzymania i luka do dolnego ograniczenia."""
+
+    def __init__(self, budget: SearchBudget | None = None, lower_bound: float | None = None):
+
+        budget = budget if budget is not None else SearchBudget()
+        self.deadline: float | None = budget.deadline_from(time.monotonic())
+        self.stall_generations: int | None = budget.stall_generations
+        self.gap_tolerance: float | None = budget.gap_tolerance
+        self.lower_bound: float | None = lower_bound
+        self.generations_completed: int = 0
+        # "generations" - wykonano wszystkie generacje, "deadline" - limit czasu, "stall" - brak poprawy,
+        # "gap" - najlepszy koszt wystarczająco blisko dolnego ograniczenia
+        self.stop_reason: str = "generations"
+        self._best_cost: float = float('inf')
+        self._stalled: int = 0
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    @property
+    def gap(self) -> float | None:
+        """Względna luka (najlepszy koszt - dolne ograniczenie) / najlepszy koszt; None bez ograniczenia lub rozwiązania."""
+        if self.lower_bound is None or self._best_cost == float('inf'):
+            return None
+        return optimality_gap(self._best_cost, self.lower_bound)
+
+    def update(self, best_cost: float, generations: int = 1) -> bool:
+        """Odnotowuje ukończone generacje i najlepszy koszt. Zwraca True, jeśli przeszukiwanie ma się zakończyć."""
+        self.generations_completed += generations
+        if best_cost < self._best_cost:
+            self._best_cost = best_cost
+            self._stalled = 0
+        else:
+            self._stalled += generations
+
+        if self.expired:
+            self.stop_reason = "deadline"
+            return True
+        if self.stall_generations is not None and self._stalled >= self.stall_generations:
+            self.stop_reason = "stall"
+            return True
+        if self.gap_tolerance is not None and self.gap is not None and self.gap <= self.gap_tolerance:
+            self.stop_reason = "gap"
+            return True
+        return False
+
+    def summary(self) -> str:
+
+        text = f"Stopped after {self.generations_completed} generations ({self.stop_reason})"
+        if self.gap is not None:
+            text += f", gap to lower bound {self.gap * 100:.2f}%"
+        return text + "."
+
+
+def seed_sequence_state(sequence: np.random.SeedSequence | None) -> dict | None:
+    """Stan SeedSequence (z licznikiem `n_children_spawned`) do zapisania w punkcie kontrolnym."""
+    if sequence is None:
+        return None
+    return {
+        "entropy": sequence.entropy,
+        "spawn_key": list(sequence.spawn_key),
+        "pool_size": sequence.pool_size,
+        "n_children_spawned": sequence.n_children_spawned,
+    }
+
+
+def seed_sequence_from_state(state: dict | None) -> np.random.SeedSequence | None:
+    """Odwrotność `seed_sequence_state`."""
+    if state is None:
+        return None
+    return np.random.SeedSequence(
+        state["entropy"],
+        spawn_key=tuple(state["spawn_key"]),
+        pool_size=state["pool_size"],
+        n_children_spawned=state["n_children_spawned"]
+    )
+
+
+def optimality_gap(cost: float, lower_bound: float) -> float | None:
+    """
+    Względna luka kosztu do dolnego ograniczenia, w przedziale [0, 1]. Koszt i ograniczenie muszą dotyczyć
+    tych samych produktów; None, gdy nie ma czego porównać (zerowy koszt - nic nie umieszczono).
+    """
+    if cost <= 0:
+        return None
+    return min(max((cost - lower_bound) / cost, 0.0), 1.0)
+
 
 class Optimizer(abc.ABC):
+
+    # Domyślne ograniczenie przeszukiwania (wywołanie `solve` może podać własne) i przebieg ostatniego `solve`
+    budget: SearchBudget | None = None
+    progress: SearchProgress | None = None
     
     @abc.abstractmethod
-    def solve(self, batch: list[Product], racks: list[Rack]) -> list[Product]:
+    def solve(self, batch: list[Product], racks: list[Rack], budget: SearchBudget | None = None) -> list[Product]:
         # TODO: - Here should be implementet given algorithm
         pass
     
@@ -13,4 +134,38 @@ class Optimizer(abc.ABC):
     @abc.abstractmethod
     def cost(self) -> float:
         # TODO: - This property should inform about iteration cost
-        pass
\ No newline at end of file
+        pass
+    
+    def state_dict(self) -> dict:
+        """
+        Stan przenoszony między epokami (strumienie losowe, start z poprzedniej partii) - zapisywany
+        w punkcie kontrolnym, by wznowiona symulacja przebiegała jak nieprzerwana. Wartości: liczby,
+        napisy, listy, słowniki o kluczach tekstowych i tablice numpy.
+        """
+        return {}
+
+    def load_state_dict(self, state: dict) -> None:
+        """Odwrotność `state_dict` - wywoływana przy wznowieniu z punktu kontrolnego."""
+        pass
+
+    def reseed(self, seed: int) -> None:
+        """Nowe ziarno strumieni losowych (np. osobne dla każdej podpartii); algorytmy deterministyczne je ignorują."""
+        pass
+
+    @property
+    def generations_completed(self) -> int:
+        return self.progress.generations_completed if self.progress is not None else 0
+
+    @property
+    def stop_reason(self) -> str | None:
+        return self.progress.stop_reason if self.progress is not None else None
+
+    def _start_search(self, budget: SearchBudget | None = None, batch: list[Product] | None = None,
+                      shelves: list[Shelf] | None = None) -> SearchProgress:
+        """
+        Rozpoczyna odliczanie limitów - ograniczenie z wywołania ma pierwszeństwo przed domyślnym.
+        Dolne ograniczenie partii jest liczone przed zmianą stanu półek, jeśli podano partię i półki.
+        """
+        lower_bound = placement_lower_bound(batch, shelves) if batch is not None and shelves is not None else None
+        self.progress = SearchProgress(budget if budget is not None else self.budget, lower_bound)
+        return self.progress
\ No newline at end of file
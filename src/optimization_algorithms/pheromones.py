@@ -0,0 +1,276 @@
+import abc
+import numpy as np
+from utility.product_table import ProductTable
+
+class PheromoneStore(abc.ABC):
+    """
+    Ślad feromonowy ACO dla par (produkt, półka). Mrówki tylko czytają wagi wyboru
+    (`weights`), a po generacji ślad paruje i jest wzmacniany jedną redukcją (`deposit`).
+    Implementacje różnią się tym, ile pamięci zajmuje ślad dla dużych partii.
+    """
+
+    def __init__(self, num_shelves: int):
+
+        self.num_shelves: int = num_shelves
+
+    @abc.abstractmethod
+    def weights(self, alpha: float, heuristic: np.ndarray):
+        """Wagi wyboru feromon^alpha * heurystyka; `weights(...)[prod_idx]` to wiersz wag produktu dla wszystkich półek."""
+        pass
+
+    @abc.abstractmethod
+    def evaporate(self, rate: float) -> None:
+        pass
+
+    @abc.abstractmethod
+    def deposit(self, products: np.ndarray, shelves: np.ndarray, amounts: np.ndarray) -> None:
+        """Dodaje `amounts[i]` feromonu do pary (`products[i]`, `shelves[i]`); pary mogą się powtarzać."""
+        pass
+
+    @abc.abstractmethod
+    def clip(self, minimum: float | None, maximum: float | None) -> None:
+        pass
+
+    @property
+    @abc.abstractmethod
+    def nbytes(self) -> int:
+        pass
+
+    @abc.abstractmethod
+    def export_state(self, product_ids: np.ndarray, shelf_ids: np.ndarray) -> dict:
+        """Ślad opisany identyfikatorami produktów i półek - do przeniesienia na kolejną partię."""
+        pass
+
+    @abc.abstractmethod
+    def import_state(self, state: dict, product_ids: np.ndarray, shelf_ids: np.ndarray) -> None:
+        """
+        Przenosi ślad z `export_state` poprzedniej partii na produkty i półki o tych samych identyfikatorach.
+        Wybór mrówki zależy tylko od proporcji w wierszu, więc przeniesione wiersze są skalowane
+        do poziomu początkowego; pary bez historii zostają na poziomie początkowym.
+        """
+        pass
+
+
+class DensePheromones(PheromoneStore):
+    """Pełna macierz (liczba_produktów, liczba_półek) - najszybsza, ale rośnie z iloczynem rozmiarów."""
+
+    def __init__(self, num_products: int, num_shelves: int):
+
+        super().__init__(num_shelves)
+        self.table: np.ndarray = np.ones((num_products, num_shelves))
+
+    def weights(self, alpha: float, heuristic: np.ndarray) -> np.ndarray:
+
+        return (self.table ** alpha) * heuristic
+
+    def evaporate(self, rate: float) -> None:
+
+        self.table *= (1 - rate)
+
+    def deposit(self, products: np.ndarray, shelves: np.ndarray, amounts: np.ndarray) -> None:
+
+        np.add.at(self.table, (products, shelves), amounts)
+
+    def clip(self, minimum: float | None, maximum: float | None) -> None:
+
+        np.clip(self.table, minimum, maximum, out=self.table)
+
+    @property
+    def nbytes(self) -> int:
+
+        return self.table.nbytes
+
+    def product_rows(self) -> np.ndarray:
+        """Wiersz tablicy śladu dla każdego produktu."""
+        return np.arange(len(self.table))
+
+    def export_state(self, product_ids: np.ndarray, shelf_ids: np.ndarray) -> dict:
+
+        return {"product_ids": product_ids, "shelf_ids": shelf_ids, "product_rows": self.product_rows(), "table": self.table.copy()}
+
+    def import_state(self, state: dict, product_ids: np.ndarray, shelf_ids: np.ndarray) -> None:
+
+        old_products = _positions(state["product_ids"], product_ids)
+        old_shelves = _positions(state["shelf_ids"], shelf_ids)
+        known_products, known_shelves = np.flatnonzero(old_products >= 0), np.flatnonzero(old_shelves >= 0)
+        if not len(known_products) or not len(known_shelves):
+            return
+
+        # Wiersz docelowy jest średnią wierszy poprzedniej partii wszystkich jego znanych produktów
+        target_rows = self.product_rows()[known_products]
+        source = state["table"][state["product_rows"][old_products[known_products]]][:, old_shelves[known_shelves]]
+        transferred = np.zeros((len(self.table), len(known_shelves)))
+        np.add.at(transferred, target_rows, source)
+        counts = np.bincount(target_rows, minlength=len(self.table))
+
+        rows = np.flatnonzero(counts)
+        transferred = transferred[rows] / counts[rows, None]
+        scale = transferred.max(axis=1, keepdims=True)
+        self.table[np.ix_(rows, known_shelves)] = np.divide(transferred, scale, out=np.ones_like(transferred), where=scale > 0)
+
+
+class ClassPheromones(DensePheromones):
+    """
+    Ślad wspólny dla klasy produktów (np. z `ProductTable.product_classes`): macierz
+    (liczba_klas, liczba_półek). Wszystkie produkty klasy czytają i wzmacniają ten sam wiersz.
+    """
+
+    def __init__(self, product_classes: np.ndarray, num_shelves: int):
+
+        self.product_classes: np.ndarray = np.asarray(product_classes, dtype=np.int64)
+        num_classes = int(self.product_classes.max()) + 1 if len(self.product_classes) else 0
+        super().__init__(num_classes, num_shelves)
+
+    def weights(self, alpha: float, heuristic: np.ndarray) -> "_ClassWeights":
+
+        return _ClassWeights(super().weights(alpha, heuristic), self.product_classes)
+
+    def deposit(self, products: np.ndarray, shelves: np.ndarray, amounts: np.ndarray) -> None:
+
+        super().deposit(self.product_classes[products], shelves, amounts)
+
+    @property
+    def nbytes(self) -> int:
+
+        return self.table.nbytes + self.product_classes.nbytes
+
+    def product_rows(self) -> np.ndarray:
+
+        return self.product_classes
+
+
+class SparsePheromones(PheromoneStore):
+    """
+    Ślad rzadki: wspólny poziom bazowy (parujący tak jak cała macierz) i posortowana lista
+    tylko tych par (produkt, półka), których ślad od niego odbiega. Pamięć rośnie z liczbą
+    par faktycznie wybieranych przez mrówki, a nie z iloczynem rozmiarów.
+    Wpisy, które po parowaniu/obcięciu zrównają się z poziomem bazowym (z dokładnością
+    względną `tolerance`), są usuwane.
+    """
+
+    def __init__(self, num_products: int, num_shelves: int, tolerance: float = 1e-12):
+
+        super().__init__(num_shelves)
+        self.num_products: int = num_products
+        self.tolerance: float = tolerance
+        self.base: float = 1.0
+        self.keys: np.ndarray = np.empty(0, dtype=np.int64)
+        self.values: np.ndarray = np.empty(0, dtype=np.float64)
+
+    def row(self, prod_idx: int) -> tuple[np.ndarray, np.ndarray]:
+        """Półki z wpisami różnymi od poziomu bazowego i ich ślad dla produktu `prod_idx`."""
+        start, end = np.searchsorted(self.keys, (prod_idx * self.num_shelves, (prod_idx + 1) * self.num_shelves))
+        return self.keys[start:end] - prod_idx * self.num_shelves, self.values[start:end]
+
+    def weights(self, alpha: float, heuristic: np.ndarray) -> "_SparseWeights":
+
+        return _SparseWeights(self, alpha, heuristic)
+
+    def evaporate(self, rate: float) -> None:
+
+        self.base *= (1 - rate)
+        self.values *= (1 - rate)
+        self._prune()
+
+    def deposit(self, products: np.ndarray, shelves: np.ndarray, amounts: np.ndarray) -> None:
+
+        new_keys = np.asarray(products, dtype=np.int64) * self.num_shelves + np.asarray(shelves, dtype=np.int64)
+        keys, inverse = np.unique(np.concatenate((self.keys, new_keys)), return_inverse=True)
+        inverse = inverse.reshape(-1)
+
+        values = np.full(len(keys), self.base)
+        values[inverse[:len(self.keys)]] = self.values
+        np.add.at(values, inverse[len(self.keys):], amounts)
+        self.keys, self.values = keys, values
+
+    def clip(self, minimum: float | None, maximum: float | None) -> None:
+
+        self.base = float(np.clip(self.base, minimum, maximum))
+        np.clip(self.values, minimum, maximum, out=self.values)
+        self._prune()
+
+    def export_state(self, product_ids: np.ndarray, shelf_ids: np.ndarray) -> dict:
+
+        return {"product_ids": product_ids, "shelf_ids": shelf_ids, "base": self.base, "keys": self.keys.copy(), "values": self.values.copy()}
+
+    def import_state(self, state: dict, product_ids: np.ndarray, shelf_ids: np.ndarray) -> None:
+
+        if state["base"] <= 0:
+            return
+
+        old_shelf_count = len(state["shelf_ids"])
+        new_products = _positions(product_ids, state["product_ids"])
+        new_shelves = _positions(shelf_ids, state["shelf_ids"])
+
+        products = new_products[state["keys"] // old_shelf_count]
+        shelves = new_shelves[state["keys"] % old_shelf_count]
+        known = (products >= 0) & (shelves >= 0)
+
+        # Cały ślad skalowany względem poziomu bazowego - proporcje w wierszach pozostają bez zmian
+        keys = products[known] * self.num_shelves + shelves[known]
+        order = np.argsort(keys, kind="stable")
+        self.base = 1.0
+        self.keys = keys[order]
+        self.values = state["values"][known][order] / state["base"]
+        self._prune()
+
+    def _prune(self) -> None:
+
+        keep = np.abs(self.values - self.base) > self.tolerance * self.base
+        if not keep.all():
+            self.keys, self.values = self.keys[keep], self.values[keep]
+
+    @property
+    def nbytes(self) -> int:
+
+        return self.keys.nbytes + self.values.nbytes
+
+
+class _ClassWeights:
+    """Wagi klas udostępniane per produkt: wiersz produktu to wiersz jego klasy."""
+
+    def __init__(self, table: np.ndarray, product_classes: np.ndarray):
+
+        self.table: np.ndarray = table
+        self.product_classes: np.ndarray = product_classes
+
+    def __getitem__(self, prod_idx: int) -> np.ndarray:
+
+        return self.table[self.product_classes[prod_idx]]
+
+
+class _SparseWeights:
+    """Wagi śladu rzadkiego: wiersz bazowy liczony raz, wpisy produktu nakładane przy odczycie."""
+
+    def __init__(self, store: SparsePheromones, alpha: float, heuristic: np.ndarray):
+
+        self.store: SparsePheromones = store
+        self.alpha: float = alpha
+        self.heuristic: np.ndarray = heuristic
+        self.base_row: np.ndarray = (store.base ** alpha) * heuristic
+
+    def __getitem__(self, prod_idx: int) -> np.ndarray:
+
+        shelves, values = self.store.row(int(prod_idx))
+        row = self.base_row.copy()
+        row[shelves] = (values ** self.alpha) * self.heuristic[shelves]
+        return row
+
+
+def _positions(keys: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Pozycja każdej wartości `values` w `keys` albo -1, jeśli jej tam nie ma."""
+    index = {key: position for position, key in enumerate(keys.tolist())}
+    return np.array([index.get(value, -1) for value in values.tolist()], dtype=np.int64)
+
+
+PHEROMONE_MODELS: tuple[str, ...] = ("dense", "class", "sparse")
+
+def make_pheromones(model: str, table: ProductTable, num_shelves: int, frequency_buckets: int = 4) -> PheromoneStore:
+
+    if model == "dense":
+        return DensePheromones(len(table), num_shelves)
+    if model == "class":
+        return ClassPheromones(table.product_classes(frequency_buckets), num_shelves)
+    if model == "sparse":
+        return SparsePheromones(len(table), num_shelves)
+    raise ValueError(f"Unknown pheromone model '{model}'. Available: {', '.join(PHEROMONE_MODELS)}.")
@@ -0,0 +1,238 @@
+import json
+import os
+import random
+import shutil
+import numpy as np
+from utility.product import Product
+from utility.rack import Rack
+from utility.warehouse_tensor import WarehouseTensor
+
+PRODUCT_DTYPE = np.dtype([
+    ("product_id", "U64"),
+    ("weight", np.float64),
+    ("dimensions", np.float64, (3,)),
+    ("frequency", np.int64),
+    ("voxel_size", np.float64),
+    ("shelf", np.int64),
+    ("position", np.float64, (3,)),
+    ("voxel_dims", np.float64, (3,)),
+])
+
+SHELF_DTYPE = np.dtype([
+    ("shelf_id", "U64"),
+    ("access_cost", np.float64),
+    ("operational_cost", np.float64),
+])
+
+class Checkpoint:
+    """
+    Punkt kontrolny symulacji zapisany jako katalog plików `.npy` (siatki wokseli, tablice
+    produktów i półek, stan generatorów losowych) oraz małego pliku `state.json`.
+    Stan optymalizatora (`Optimizer.state_dict`) trafia do `state.json`, a jego tablice do plików `optimizer_<i>.npy`.
+    Pliki `.npy` są otwierane przez mapowanie pamięci, więc odczyt nie wymaga parsowania
+    ani kopiowania - narzędzia analityczne mogą otworzyć checkpoint tylko do odczytu.
+    """
+
+    def __init__(self, path: str, mmap_mode: str | None = "r"):
+
+        self.path: str = path
+
+        with open(os.path.join(path, "state.json"), encoding="utf-8") as state_file:
+            self.state: dict = json.load(state_file)
+
+        self.voxel_grids: np.ndarray = np.load(os.path.join(path, "voxel_grids.npy"), mmap_mode=mmap_mode)
+        self.shelves: np.ndarray = np.load(os.path.join(path, "shelves.npy"), mmap_mode=mmap_mode)
+        self.products: np.ndarray = np.load(os.path.join(path, "products.npy"), mmap_mode=mmap_mode)
+        self.python_rng: np.ndarray = np.load(os.path.join(path, "python_rng.npy"), mmap_mode=mmap_mode)
+        self.numpy_rng: np.ndarray = np.load(os.path.join(path, "numpy_rng.npy"), mmap_mode=mmap_mode)
+
+        # Dodatkowy stan reprezentacji półek (ShelfStorage.export_state): klucz -> (złączone tablice, przesunięcia)
+        self.storage_state: dict[str, tuple[np.ndarray, np.ndarray]] = {
+            key: (
+                np.load(os.path.join(path, f"storage_{key}.npy"), mmap_mode=mmap_mode),
+                np.load(os.path.join(path, f"storage_{key}_offsets.npy"), mmap_mode=mmap_mode)
+            )
+            for key in self.state["storage_keys"]
+        }
+        self._mmap_mode: str | None = mmap_mode
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.isfile(os.path.join(path, "state.json"))
+
+    @classmethod
+    def open(cls, path: str) -> "Checkpoint":
+        """Otwiera checkpoint tylko do odczytu, bez kopiowania danych."""
+        return cls(path, mmap_mode="r")
+
+    @property
+    def epoch(self) -> int:
+        return self.state["epoch"]
+
+    @property
+    def total_cost(self) -> float:
+        return self.state["total_cost"]
+
+    @property
+    def optimizer_state(self) -> dict:
+        """Stan optymalizatora z chwili zapisu (kopie tablic - optymalizator może je modyfikować)."""
+        arrays = [
+            np.array(np.load(os.path.join(self.path, f"optimizer_{i}.npy"), mmap_mode=self._mmap_mode))
+            for i in range(self.state.get("optimizer_arrays", 0))
+        ]
+        return _join_arrays(self.state.get("optimizer", {}), arrays)
+
+    ## - Zapis
+    @staticmethod
+    def save(path: str, racks: list[Rack], pending_products: list[Product], epoch: int, total_cost: float,
+             optimizer_state: dict | None = None) -> None:
+        """Zapisuje stan po zakończonej epoce. Zapis jest atomowy - najpierw do katalogu tymczasowego."""
+        shelves = [shelf for rack in racks for shelf in rack.shelves]
+
+        tensor = WarehouseTensor.of(shelves)
+        voxel_grids = tensor.voxel_grids if tensor is not None else np.stack([shelf.voxel_grid for shelf in shelves])
+
+        shelf_table = np.array(
+            [(shelf.shelf_id, shelf.access_cost, shelf.operational_cost) for shelf in shelves],
+            dtype=SHELF_DTYPE
+        )
+
+        placed = [(shelf_idx, product) for shelf_idx, shelf in enumerate(shelves) for product in shelf.stored_products]
+        pending = [(-1, product) for product in pending_products]
+        product_table = np.array(
+            [
+                (product.product_id, product.weight, product.dimensions, product.frequency, product.voxel_size,
+                 shelf_idx, product.position or (0, 0, 0), product.voxel_dims or (0, 0, 0))
+                for shelf_idx, product in placed + pending
+            ],
+            dtype=PRODUCT_DTYPE
+        )
+
+        storage_states = [shelf.storage.export_state() for shelf in shelves]
+        storage_keys = sorted({key for state in storage_states for key in state})
+
+        optimizer_arrays: list[np.ndarray] = []
+        optimizer = _split_arrays(optimizer_state or {}, optimizer_arrays)
+
+        _version, python_state, gauss_next = random.getstate()
+        _name, numpy_keys, numpy_pos, numpy_has_gauss, numpy_cached_gaussian = np.random.get_state()
+
+        state = {
+            "epoch": epoch,
+            "total_cost": total_cost,
+            "python_gauss_next": gauss_next,
+            "numpy_pos": int(numpy_pos),
+            "numpy_has_gauss": int(numpy_has_gauss),
+            "numpy_cached_gaussian": float(numpy_cached_gaussian),
+            "storage_keys": storage_keys,
+            "optimizer": optimizer,
+            "optimizer_arrays": len(optimizer_arrays),
+        }
+
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        np.save(os.path.join(tmp_path, "voxel_grids.npy"), voxel_grids)
+        np.save(os.path.join(tmp_path, "shelves.npy"), shelf_table)
+        np.save(os.path.join(tmp_path, "products.npy"), product_table)
+        np.save(os.path.join(tmp_path, "python_rng.npy"), np.array(python_state, dtype=np.uint32))
+        np.save(os.path.join(tmp_path, "numpy_rng.npy"), np.asarray(numpy_keys, dtype=np.uint32))
+        for key in storage_keys:
+            parts = [state[key] for state in storage_states if key in state]
+            sizes = [len(state[key]) if key in state else 0 for state in storage_states]
+            np.save(os.path.join(tmp_path, f"storage_{key}.npy"), np.concatenate(parts))
+            np.save(os.path.join(tmp_path, f"storage_{key}_offsets.npy"), np.concatenate([[0], np.cumsum(sizes)]))
+        for i, array in enumerate(optimizer_arrays):
+            np.save(os.path.join(tmp_path, f"optimizer_{i}.npy"), array)
+        with open(os.path.join(tmp_path, "state.json"), "w", encoding="utf-8") as state_file:
+            json.dump(state, state_file)
+
+        old_path = f"{path}.old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    ## - Odtworzenie
+    def restore(self, racks: list[Rack]) -> list[Product]:
+        """
+        Odtwarza zawartość półek i stan generatorów losowych. Zwraca kolejkę produktów oczekujących.
+        Regały muszą mieć tę samą konfigurację (identyfikatory półek) co przy zapisie.
+        """
+        shelves = [shelf for rack in racks for shelf in rack.shelves]
+        saved_ids = [str(shelf_id) for shelf_id in self.shelves["shelf_id"]]
+        if saved_ids != [shelf.shelf_id for shelf in shelves]:
+            raise ValueError("Checkpoint was saved for a different warehouse layout.")
+
+        for shelf in shelves:
+            shelf.reset()
+
+        # Dla tensora zajętość całego magazynu to jedna kopia pamięci
+        tensor = WarehouseTensor.of(shelves)
+        if tensor is not None:
+            tensor.load(self.voxel_grids)
+
+        pending_products: list[Product] = []
+        for row in self.products:
+            product = Product(
+                product_id=str(row["product_id"]),
+                weight=float(row["weight"]),
+                dimensions=tuple(float(d) for d in row["dimensions"]),
+                frequency=int(row["frequency"]),
+                voxel_size=float(row["voxel_size"])
+            )
+
+            shelf_idx = int(row["shelf"])
+            if shelf_idx < 0:
+                pending_products.append(product)
+                continue
+
+            shelf = shelves[shelf_idx]
+            cast = float if shelf.storage.continuous else int
+            position = tuple(cast(v) for v in row["position"])
+            voxel_dims = tuple(cast(v) for v in row["voxel_dims"])
+            shelf.place_product_at(product, position, voxel_dims, occupy=tensor is None)
+
+        for shelf_idx, shelf in enumerate(shelves):
+            shelf.storage.import_state({
+                key: data[offsets[shelf_idx]:offsets[shelf_idx + 1]]
+                for key, (data, offsets) in self.storage_state.items()
+            })
+
+        python_state = tuple(int(v) for v in self.python_rng)
+        random.setstate((3, python_state, self.state["python_gauss_next"]))
+        np.random.set_state((
+            "MT19937",
+            np.array(self.numpy_rng, dtype=np.uint32),
+            self.state["numpy_pos"],
+            self.state["numpy_has_gauss"],
+            self.state["numpy_cached_gaussian"],
+        ))
+
+        return pending_products
+
+
+def _split_arrays(value, arrays: list[np.ndarray]):
+    """Zastępuje tablice numpy w zagnieżdżonym stanie odwołaniami {"__array__": i}; tablice trafiają do `arrays`."""
+    if isinstance(value, np.ndarray):
+        arrays.append(value)
+        return {"__array__": len(arrays) - 1}
+    if isinstance(value, dict):
+        return {str(key): _split_arrays(item, arrays) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_split_arrays(item, arrays) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def _join_arrays(value, arrays: list[np.ndarray]):
+    """Odwrotność `_split_arrays`."""
+    if isinstance(value, dict):
+        if set(value) == {"__array__"}:
+            return arrays[value["__array__"]]
+        return {key: _join_arrays(item, arrays) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_join_arrays(item, arrays) for item in value]
+    return value
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+
+class FitCache:
+    """
+    Ograniczony cache LRU wyników wyszukiwania miejsca: (shelf_id, wersja półki, wymiary) -> pozycja.
+    Wersja półki zmienia się przy każdym umieszczeniu i usunięciu produktu, więc wpisy dla
+    nieaktualnego stanu nigdy nie zostaną trafione i z czasem wypadają z cache.
+    """
+
+    def __init__(self, maxsize: int = 100_000):
+
+        self.maxsize: int = maxsize
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple, default=None):
+
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        self.misses += 1
+        return default
+
+    def put(self, key: tuple, value) -> None:
+
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+
+        self._entries.clear()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
+# Wspólny cache dla wszystkich półek i wszystkich optymalizatorów
+fit_cache = FitCache()
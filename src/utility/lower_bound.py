@@ -0,0 +1,47 @@
+import numpy as np
+from utility.product import Product
+from utility.product_table import ProductTable
+from utility.shelf import Shelf
+from utility.warehouse_tensor import shelf_costs, free_voxels
+
+def placement_lower_bound(batch: list[Product] | ProductTable, shelves: list[Shelf], free_capacity: np.ndarray | None = None) -> float:
+    """
+    Dolne ograniczenie kosztu umieszczenia partii na półkach w ich bieżącym stanie
+    (albo przy wolnym miejscu `free_capacity` - np. zapamiętanym przed umieszczeniem partii).
+    Relaksacja transportowa: produkty są podzielne i zajmują tylko swoją objętość (bez geometrii).
+    Jej optimum to wypełnianie wolnego miejsca półek od najtańszej produktami o największej
+    gęstości kosztu (częstotliwość / objętość); objętość ponad wolne miejsce magazynu nic nie kosztuje.
+    """
+    table = batch if isinstance(batch, ProductTable) else ProductTable(batch)
+    if not len(table) or not shelves:
+        return 0.0
+
+    # Objętość w jednostkach reprezentacji półek; przy mieszanych reprezentacjach mniejsza z nich (ograniczenie pozostaje poprawne)
+    voxel_volume = table.voxel_volume.astype(np.float64)
+    continuous = np.array([shelf.storage.continuous for shelf in shelves], dtype=bool)
+    if continuous.any():
+        continuous_volume = np.array([product.volume / product.voxel_size ** 3 for product in table.products], dtype=np.float64)
+        volume = continuous_volume if continuous.all() else np.minimum(voxel_volume, continuous_volume)
+    else:
+        volume = voxel_volume
+
+    density = table.frequency / np.maximum(volume, 1e-12)
+    product_order = np.argsort(-density, kind="stable")
+    product_ends = np.cumsum(volume[product_order])
+
+    costs = shelf_costs(shelves)
+    shelf_order = np.argsort(costs, kind="stable")
+    free = free_voxels(shelves) if free_capacity is None else np.asarray(free_capacity, dtype=np.float64)
+    capacity_ends = np.cumsum(np.maximum(free, 0.0)[shelf_order])
+
+    # Odcinki osi objętości, na których gęstość produktu i koszt półki są stałe
+    filled = min(product_ends[-1], capacity_ends[-1])
+    breakpoints = np.unique(np.concatenate(([0.0], product_ends, capacity_ends)))
+    breakpoints = breakpoints[breakpoints <= filled]
+    if len(breakpoints) < 2:
+        return 0.0
+
+    starts, lengths = breakpoints[:-1], np.diff(breakpoints)
+    product_at = product_order[np.searchsorted(product_ends, starts, side="right")]
+    shelf_at = shelf_order[np.searchsorted(capacity_ends, starts, side="right")]
+    return float(np.sum(lengths * density[product_at] * costs[shelf_at]))
@@ -0,0 +1,152 @@
+import numpy as np
+from utility.product import Product
+from utility.shelf import Shelf
+from utility.fit_cache import FitCache
+from utility.placement_session import PlacementSession
+from utility.warehouse_index import WarehouseIndex
+from utility.warehouse_tensor import shelf_costs, free_voxels
+
+class PackingEngine:
+    """
+    Ocena przypisań produktów do półek (chromosomów GA, rozwiązań ACO) z pamięcią wyników per półka.
+    Półki są od siebie niezależne: wynik pakowania na półce zależy tylko od jej stanu (wersji)
+    i od uporządkowanej listy przypisanych do niej produktów. Wyniki są zapamiętywane pod kluczem
+    (półka, wersja, produkty w kolejności umieszczania), więc rozwiązanie potomne przelicza
+    tylko półki, których przypisanie się zmieniło.
+
+    `bounds` to tania relaksacja pojemnościowa (tylko objętości, bez geometrii) - pozwala
+    odrzucić rozwiązania, które na pewno nie pobiją najlepszego, bez dokładnego pakowania.
+    """
+
+    def __init__(self,
+                 shelves: list[Shelf],
+                 batch: list[Product],
+                 placement_order: np.ndarray | list[int] | None = None,
+                 fit_index: WarehouseIndex | None = None,
+                 maxsize: int = 100_000):
+
+        self.shelves: list[Shelf] = shelves
+        self.batch: list[Product] = batch
+        self.fit_index: WarehouseIndex | None = fit_index
+        self.placement_order: np.ndarray = np.asarray(
+            placement_order if placement_order is not None else range(len(batch)), dtype=np.int64
+        )
+        self.memo: FitCache = FitCache(maxsize=maxsize)
+
+        self._shelf_costs: np.ndarray = shelf_costs(shelves)
+        self._frequency: np.ndarray = np.array([product.frequency for product in batch], dtype=np.float64)
+
+        # Objętości produktów w jednostkach reprezentacji półki: wokselach albo ciągłych jednostkach woksela
+        self._continuous: np.ndarray = np.array([shelf.storage.continuous for shelf in shelves], dtype=bool)
+        self._voxel_volume: np.ndarray = np.array([np.prod(product.dims_in_voxels()) for product in batch], dtype=np.float64)
+        self._continuous_volume: np.ndarray = np.array(
+            [product.volume / product.voxel_size ** 3 for product in batch], dtype=np.float64
+        )
+
+        self.exact_calls: int = 0
+        self.surrogate_calls: int = 0
+
+    def evaluate(self, assignment: np.ndarray | list[int]) -> tuple[float, list[Product]]:
+        """
+        Zwraca koszt przypisania i listę produktów, których nie udało się umieścić.
+        `assignment[i]` to numer półki produktu `i` albo -1 (produkt nieprzypisany).
+        Stan magazynu po ocenie jest taki sam jak przed nią.
+        """
+        self.exact_calls += 1
+        shelf_of = np.asarray(assignment, dtype=np.int64)[self.placement_order]
+        assigned = shelf_of >= 0
+
+        # Grupowanie po półkach z zachowaniem kolejności umieszczania wewnątrz grupy
+        grouping = np.argsort(shelf_of, kind="stable")
+        grouping = grouping[assigned[grouping]]
+        grouped_shelves = shelf_of[grouping]
+        grouped_products = self.placement_order[grouping]
+        starts = np.flatnonzero(np.diff(grouped_shelves, prepend=-1))
+        ends = np.append(starts[1:], len(grouped_shelves))
+
+        total_cost = 0.0
+        unplaced_indices = [self.placement_order[~assigned]]
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            cost, unplaced = self._pack_shelf(int(grouped_shelves[start]), grouped_products[start:end])
+            total_cost += cost
+            unplaced_indices.append(unplaced)
+
+        unplaced_order = np.concatenate(unplaced_indices)
+        return total_cost, [self.batch[i] for i in unplaced_order]
+
+    def _pack_shelf(self, shelf_idx: int, products: np.ndarray) -> tuple[float, np.ndarray]:
+
+        shelf = self.shelves[shelf_idx]
+        key = (shelf_idx, shelf.version, products.tobytes())
+        result = self.memo.get(key)
+        if result is not None:
+            return result
+
+        placed = np.zeros(len(products), dtype=bool)
+        with PlacementSession() as session:
+            for position, product_idx in enumerate(products.tolist()):
+                product = self.batch[product_idx]
+                if self.fit_index is not None and not self.fit_index.can_fit(shelf_idx, product.dims_in_voxels(), refresh=False):
+                    continue
+                placed[position] = session.place(shelf, product)
+
+        cost = float(self._frequency[products[placed]].sum() * self._shelf_costs[shelf_idx])
+        result = (cost, products[~placed])
+        self.memo.put(key, result)
+        return result
+
+    def bounds(self, assignments: np.ndarray, penalty: float = 0.0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Relaksacja pojemnościowa dla całej macierzy przypisań `(liczba_rozwiązań, liczba_produktów)` naraz.
+        Zwraca dla każdego rozwiązania:
+        - dolne ograniczenie kosztu z karą `penalty` za każdy nieumieszczony produkt,
+        - liczbę produktów, które na pewno się nie zmieszczą (suma objętości ponad wolne miejsce półki).
+        Na półce z nadmiarem objętości trzeba pominąć co najmniej k produktów, gdzie k to najmniejsza
+        liczba największych produktów, których objętość pokrywa nadmiar.
+        """
+        assignments = np.atleast_2d(np.asarray(assignments, dtype=np.int64))
+        num_solutions, num_shelves = len(assignments), len(self.shelves)
+        self.surrogate_calls += num_solutions
+
+        rows, products = np.nonzero(assignments >= 0)
+        shelves = assignments[rows, products]
+        groups = rows * num_shelves + shelves
+        unassigned = (assignments < 0).sum(axis=1)
+
+        volume = np.where(self._continuous[shelves], self._continuous_volume[products], self._voxel_volume[products])
+        excess = np.bincount(groups, volume, minlength=num_solutions * num_shelves)
+        excess -= np.tile(free_voxels(self.shelves), num_solutions)
+
+        # Minimalna liczba pominiętych produktów: od największego, aż objętość pokryje nadmiar
+        order = np.lexsort((-volume, groups))
+        prefix = _group_exclusive_cumsum(groups[order], volume[order])
+        forced = np.zeros(len(order), dtype=bool)
+        forced[order] = prefix < excess[groups[order]] - 1e-9
+        forced_count = np.bincount(groups, forced, minlength=num_solutions * num_shelves).astype(np.int64)
+
+        # Optymistyczny koszt: pomijamy te produkty, dla których kara kosztuje najmniej względem umieszczenia
+        contribution = self._frequency[products] * self._shelf_costs[shelves]
+        saving = penalty - contribution
+        order = np.lexsort((saving, groups))
+        rank = _group_rank(groups[order])
+        skipped = np.zeros(len(order), dtype=bool)
+        skipped[order] = (rank < forced_count[groups[order]]) | (saving[order] < 0)
+
+        lower_bound = np.bincount(rows, np.where(skipped, penalty, contribution), minlength=num_solutions)
+        lower_bound += unassigned * penalty
+        overflow = forced_count.reshape(num_solutions, num_shelves).sum(axis=1) + unassigned
+
+        return lower_bound, overflow
+
+
+def _group_rank(sorted_groups: np.ndarray) -> np.ndarray:
+    """Pozycja elementu w obrębie swojej grupy (grupy są ciągłymi blokami posortowanej tablicy)."""
+    positions = np.arange(len(sorted_groups))
+    is_start = np.diff(sorted_groups, prepend=-1) != 0
+    return positions - np.maximum.accumulate(np.where(is_start, positions, 0))
+
+def _group_exclusive_cumsum(sorted_groups: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Suma wartości poprzedzających element w obrębie jego grupy."""
+    exclusive = np.cumsum(values) - values
+    starts = np.arange(len(sorted_groups)) - _group_rank(sorted_groups)
+    return exclusive - exclusive[starts]
@@ -0,0 +1,72 @@
+from utility.product import Product
+from utility.shelf import Shelf
+
+class PlacementSession:
+    """
+    Próbne rozmieszczanie produktów bezpośrednio na żywym stanie magazynu.
+    Każde udane umieszczenie i zdjęcie produktu trafia do dziennika cofania, a `rollback` przywraca
+    półki (łącznie z ich wersjami) i produkty dokładnie do stanu sprzed sesji.
+
+    Użycie:
+        with PlacementSession() as session:
+            session.place(shelf, product)
+            ...
+        # tutaj stan jest już przywrócony
+    """
+
+    def __init__(self):
+
+        # Przedostatni element wpisu: stan reprezentacji półki do cofnięcia (`storage.undo_state()`),
+        # ostatni: None dla umieszczenia, indeks w `stored_products` dla zdjęcia produktu
+        self._log: list[tuple[Shelf, Product, tuple, int, object, int | None]] = []
+
+    def __enter__(self) -> "PlacementSession":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+
+        self.rollback()
+        return False
+
+    def __len__(self) -> int:
+        return len(self._log)
+
+    def place(self, shelf: Shelf, product: Product) -> bool:
+
+        saved_product_state = (product.assigned_shelf, product.position, product.orientation, product.voxel_dims)
+        saved_version = shelf.version
+        storage_state = shelf.storage.undo_state()
+
+        if not shelf.place_product(product):
+            return False
+
+        self._log.append((shelf, product, saved_product_state, saved_version, storage_state, None))
+        return True
+
+    def remove(self, shelf: Shelf, product: Product) -> bool:
+
+        saved_product_state = (product.assigned_shelf, product.position, product.orientation, product.voxel_dims)
+        saved_version = shelf.version
+        index = next((i for i, stored in enumerate(shelf.stored_products) if stored is product), None)
+        storage_state = shelf.storage.undo_state()
+
+        if index is None or not shelf.remove_product(product):
+            return False
+
+        self._log.append((shelf, product, saved_product_state, saved_version, storage_state, index))
+        return True
+
+    def rollback(self) -> None:
+        """Cofa wszystkie umieszczenia i zdjęcia produktów w odwrotnej kolejności."""
+        while self._log:
+            shelf, product, saved_product_state, saved_version, storage_state, index = self._log.pop()
+            if index is None:
+                shelf.revert_placement(product, saved_version, storage_state)
+                product.assigned_shelf, product.position, product.orientation, product.voxel_dims = saved_product_state
+            else:
+                product.assigned_shelf, product.position, product.orientation, product.voxel_dims = saved_product_state
+                shelf.revert_removal(product, index, saved_version, storage_state)
+
+    def commit(self) -> None:
+        """Zatwierdza zmiany - dziennik jest czyszczony bez cofania zmian."""
+        self._log.clear()
@@ -1,6 +1,11 @@
 import numpy as np
 
 class Product:
+
+    __slots__ = (
+        "product_id", "weight", "dimensions", "frequency", "volume", "assigned_shelf",
+        "voxel_size", "voxel_dims", "position", "orientation", "_voxel_dims"
+    )
     
     def __init__(self,
                  product_id: str,
@@ -22,6 +27,13 @@ class Product:
 
         self.position: tuple[int, int, int] | None = None
         self.orientation: tuple[int, int, int] | None = None
+
+        # Wymiary w wokselach nie zmieniają się w czasie życia produktu - liczymy je raz
+        self._voxel_dims: tuple[int, int, int] = (
+            int(np.ceil(self.dimensions[0] / self.voxel_size)),
+            int(np.ceil(self.dimensions[1] / self.voxel_size)),
+            int(np.ceil(self.dimensions[2] / self.voxel_size))
+        )
     
     def __eq__(self, other: object) -> bool:
 
@@ -39,11 +51,7 @@ class Product:
     
     def dims_in_voxels(self) -> tuple[int, int, int]:
 
-        return (
-            int(np.ceil(self.dimensions[0] / self.voxel_size)),
-            int(np.ceil(self.dimensions[1] / self.voxel_size)),
-            int(np.ceil(self.dimensions[2] / self.voxel_size))
-        )
+        return self._voxel_dims
     
     def reset(self) -> None:
 
@@ -0,0 +1,52 @@
+import numpy as np
+from utility.product import Product
+
+class ProductTable:
+    """
+    Kolumnowa (struct-of-arrays) reprezentacja partii produktów, budowana raz na partię.
+    Wiersz `i` odpowiada produktowi `products[i]`, więc optymalizatory mogą sortować,
+    filtrować i liczyć koszty na tablicach NumPy zamiast na listach obiektów.
+    """
+
+    def __init__(self, products: list[Product]):
+
+        self.products: list[Product] = products
+        count = len(products)
+
+        self.product_ids: np.ndarray = np.array([product.product_id for product in products], dtype=str)
+        self.dimensions: np.ndarray = np.array([product.dimensions for product in products], dtype=np.float64).reshape(count, 3)
+        self.voxel_dims: np.ndarray = np.array([product.dims_in_voxels() for product in products], dtype=np.int64).reshape(count, 3)
+        self.volume: np.ndarray = np.array([product.volume for product in products], dtype=np.float64)
+        self.weight: np.ndarray = np.array([product.weight for product in products], dtype=np.float64)
+        self.frequency: np.ndarray = np.array([product.frequency for product in products], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def __getitem__(self, index: int) -> Product:
+        return self.products[index]
+
+    @property
+    def voxel_volume(self) -> np.ndarray:
+        """Liczba wokseli zajmowanych przez każdy produkt."""
+        return self.voxel_dims.prod(axis=1)
+
+    def order_by_volume(self, descending: bool = True) -> np.ndarray:
+        """Indeksy wierszy posortowane stabilnie po objętości (jak `sorted(..., key=volume)`)."""
+        return np.argsort(-self.volume if descending else self.volume, kind="stable")
+
+    def order_by_frequency(self, descending: bool = True) -> np.ndarray:
+        """Indeksy wierszy posortowane stabilnie po częstotliwości."""
+        return np.argsort(-self.frequency if descending else self.frequency, kind="stable")
+
+    def product_classes(self, frequency_buckets: int = 4) -> np.ndarray:
+        """
+        Numer klasy każdego produktu: produkty o tych samych wymiarach w wokselach i tym samym
+        przedziale częstotliwości (kwantyle partii, `frequency_buckets` przedziałów) mają wspólną klasę.
+        Klasy są numerowane 0..liczba_klas-1.
+        """
+        edges = np.quantile(self.frequency, np.linspace(0.0, 1.0, frequency_buckets + 1)[1:-1]) if len(self) else np.empty(0)
+        bucket = np.searchsorted(edges, self.frequency, side="right")
+        keys = np.column_stack((self.voxel_dims, bucket))
+        _keys, classes = np.unique(keys, axis=0, return_inverse=True)
+        return classes.reshape(-1).astype(np.int64)
@@ -0,0 +1,100 @@
+import numpy as np
+from multiprocessing import shared_memory
+from utility.product import Product
+from utility.shelf import Shelf
+from utility.warehouse_tensor import WarehouseTensor
+
+class SharedBatch:
+    """
+    Publikuje stan magazynu (siatki wokseli półek) i tablice produktów partii w jednym bloku
+    `multiprocessing.shared_memory`. Procesy robocze dostają tylko mały opis `spec`
+    (nazwa bloku i układ tablic) i odtwarzają z niego własne kopie półek i produktów,
+    więc stan nie jest serializowany dla każdego zadania.
+    """
+
+    def __init__(self, shelves: list[Shelf], batch: list[Product]):
+
+        tensor = WarehouseTensor.of(shelves)
+        arrays = {
+            "voxel_grids": tensor.voxel_grids if tensor is not None else np.stack([shelf.voxel_grid for shelf in shelves]),
+            "shelf_ids": np.array([shelf.shelf_id for shelf in shelves], dtype=str),
+            "shelf_costs": np.array([(shelf.access_cost, shelf.operational_cost) for shelf in shelves], dtype=np.float64),
+            "allow_rotation": np.array([shelf.allow_rotation for shelf in shelves], dtype=bool),
+            "product_ids": np.array([product.product_id for product in batch], dtype=str),
+            "weight": np.array([product.weight for product in batch], dtype=np.float64),
+            "dimensions": np.array([product.dimensions for product in batch], dtype=np.float64).reshape(-1, 3),
+            "frequency": np.array([product.frequency for product in batch], dtype=np.int64),
+            "voxel_size": np.array([product.voxel_size for product in batch], dtype=np.float64),
+        }
+
+        layout = []
+        offset = 0
+        for key, array in arrays.items():
+            layout.append((key, array.dtype.str, array.shape, offset))
+            offset += -(-array.nbytes // 8) * 8
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for (key, dtype, shape, start), array in zip(layout, arrays.values()):
+            np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=start)[...] = array
+
+        self.spec: dict = {"name": self._shm.name, "layout": layout}
+
+    def __enter__(self) -> "SharedBatch":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+
+        self.close()
+        return False
+
+    def close(self) -> None:
+        """Zwalnia blok pamięci współdzielonej (po stronie procesu, który go utworzył)."""
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    @staticmethod
+    def attach(spec: dict) -> tuple[list[Shelf], list[Product]]:
+        """
+        Odtwarza w procesie roboczym półki (na wspólnym tensorze, z gęstą reprezentacją)
+        i produkty partii. Dane są kopiowane, więc blok można od razu odłączyć.
+        """
+        shm = shared_memory.SharedMemory(name=spec["name"])
+        try:
+            arrays = {
+                key: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start).copy()
+                for key, dtype, shape, start in spec["layout"]
+            }
+        finally:
+            shm.close()
+
+        tensor = WarehouseTensor(len(arrays["voxel_grids"]), arrays["voxel_grids"].shape[1:])
+        shelves: list[Shelf] = []
+        for shelf_id, (access_cost, operational_cost), allow_rotation in zip(arrays["shelf_ids"], arrays["shelf_costs"], arrays["allow_rotation"]):
+            shelf = Shelf(
+                shelf_id=str(shelf_id),
+                access_cost=float(access_cost),
+                operational_cost=float(operational_cost),
+                storage=tensor.make_storage(len(tensor.shelves)),
+                allow_rotation=bool(allow_rotation)
+            )
+            tensor.register(shelf)
+            shelves.append(shelf)
+
+        tensor.load(arrays["voxel_grids"])
+
+        products = [
+            Product(
+                product_id=str(product_id),
+                weight=float(weight),
+                dimensions=tuple(float(d) for d in dimensions),
+                frequency=int(frequency),
+                voxel_size=float(voxel_size)
+            )
+            for product_id, weight, dimensions, frequency, voxel_size in zip(
+                arrays["product_ids"], arrays["weight"], arrays["dimensions"], arrays["frequency"], arrays["voxel_size"]
+            )
+        ]
+
+        return shelves, products
@@ -1,5 +1,12 @@
+import itertools
 import numpy as np
 from utility.product import Product
+from utility.shelf_storage import ShelfStorage, make_storage
+from utility.fit_cache import fit_cache
+
+# Globalny licznik stanów - każda zmiana zawartości dowolnej półki (także kopii) dostaje unikalną wersję
+_state_versions = itertools.count(1)
+_not_cached = object()
 
 class Shelf:
     
@@ -18,14 +25,17 @@ class Shelf:
     def __init__(self, 
                  shelf_id: str,
                  access_cost: float,
-                 operational_cost: float = 0.0
+                 operational_cost: float = 0.0,
+                 storage: str | ShelfStorage = "dense",
+                 allow_rotation: bool = False
                  ):
 
         self.shelf_id: str = shelf_id
-        self.voxel_grid: np.ndarray = np.zeros(Shelf.grid_dimension, dtype=np.int8)
+        self.storage: ShelfStorage = storage if isinstance(storage, ShelfStorage) else make_storage(storage, Shelf.grid_dimension)
         self.voxel_size: float = Shelf.voxel_size
         self.stored_products: list[Product] = []
-        self.occupied_voxels_count: int = 0
+        self.allow_rotation: bool = allow_rotation
+        self.version: int = next(_state_versions)
 
         self.access_cost: float = access_cost
         self.operational_cost: float = operational_cost
@@ -50,41 +60,53 @@ class Shelf:
     def get_products_count(self) -> int:
         return len(self.stored_products)
 
-    ## - Methods
-    def find_placement_position(self, product_voxel_dims: tuple[int, int, int]) -> tuple[int, int, int] | None:
+    @property
+    def occupied_voxels_count(self) -> int:
+        return self.storage.occupied_voxels
 
-        px, py, pz = product_voxel_dims
-        gx, gy, gz = Shelf.grid_dimension
+    @property
+    def voxel_grid(self) -> np.ndarray:
+        return self.storage.to_dense()
 
-        for z in range(gz - pz + 1):
-            for y in range(gy - py + 1):
-                for x in range(gx - px + 1):
+    ## - Methods
+    def is_box_free(self, position: tuple[int, int, int], product_voxel_dims: tuple[int, int, int]) -> bool:
 
-                    is_space_free = True
+        return self.storage.is_free(position, product_voxel_dims)
 
-                    if np.any(self.voxel_grid[x:x+px, y:y+py, z:z+pz] != 0):
-                        is_space_free = False
+    def find_placement_position(self, product_voxel_dims: tuple[int, int, int]) -> tuple[int, int, int] | None:
 
-                    if is_space_free:
-                        return (x, y, z)
-        
-        return None
+        key = (self.shelf_id, self.version, product_voxel_dims)
+        position = fit_cache.get(key, _not_cached)
+        if position is _not_cached:
+            position = self.storage.find_position(product_voxel_dims)
+            fit_cache.put(key, position)
+        return position
+
+    def find_placement_any_orientation(self, product_voxel_dims: tuple[int, int, int]) -> tuple[tuple[int, int, int], tuple[int, int, int]] | None:
+
+        key = (self.shelf_id, self.version, product_voxel_dims, "any")
+        placement = fit_cache.get(key, _not_cached)
+        if placement is _not_cached:
+            placement = self.storage.find_position_any_orientation(product_voxel_dims)
+            fit_cache.put(key, placement)
+        return placement
     
     def place_product(self, product: Product) -> bool:
 
-        product_voxel_dims = product.dims_in_voxels()
+        product_voxel_dims = self.storage.product_dims(product)
         current_orientation_dims = product_voxel_dims
 
-        placement_position = self.find_placement_position(current_orientation_dims)
+        if self.allow_rotation:
+            placement = self.find_placement_any_orientation(product_voxel_dims)
+            placement_position, current_orientation_dims = placement if placement else (None, product_voxel_dims)
+        else:
+            placement_position = self.find_placement_position(current_orientation_dims)
 
         if placement_position:
 
-            x, y, z = placement_position
-            px, py, pz = current_orientation_dims
-            self.voxel_grid[x:x+px, y:y+py, z:z+pz] = 1
-
+            self.storage.occupy(placement_position, current_orientation_dims)
             self.stored_products.append(product)
-            self.occupied_voxels_count = np.sum(self.voxel_grid)
+            self.version = next(_state_versions)
 
             product.assigned_shelf = self
             product.position = placement_position
@@ -95,28 +117,76 @@ class Shelf:
         
         return False
     
+    def place_product_at(self,
+                         product: Product,
+                         position: tuple[int, int, int],
+                         voxel_dims: tuple[int, int, int],
+                         occupy: bool = True) -> bool:
+        """
+        Umieszcza produkt w podanej pozycji i orientacji, bez wyszukiwania miejsca.
+        Przy `occupy=False` zakłada, że reprezentacja zajętości już zawiera ten produkt
+        (np. po wczytaniu całej siatki z punktu kontrolnego).
+        """
+        if occupy:
+            if not self.storage.is_free(position, voxel_dims):
+                return False
+            self.storage.occupy(position, voxel_dims)
+
+        self.stored_products.append(product)
+        self.version = next(_state_versions)
+
+        product.assigned_shelf = self
+        product.position = position
+        product.orientation = tuple(dim * self.voxel_size for dim in voxel_dims)
+        product.voxel_dims = voxel_dims
+
+        return True
+    
     def remove_product(self, product: Product) -> bool:
 
         if product not in self.stored_products or product.position is None or product.orientation is None:
             return False
         
-        x, y, z = product.position
-        ox, oy, oz = product.voxel_dims
-
-        self.voxel_grid[x:x+ox, y:y+oy, z:z+oz] = 0
-
+        self.storage.release(product.position, product.voxel_dims)
         self.stored_products.remove(product)
-        self.occupied_voxels_count = np.sum(self.voxel_grid)
+        self.version = next(_state_versions)
 
         product.reset()
 
         return True
     
+    def revert_placement(self, product: Product, version: int, storage_state=None) -> None:
+        """
+        Cofa ostatnie umieszczenie na tej półce i przywraca jej wcześniejszą wersję.
+        Używane przez PlacementSession - stan po cofnięciu jest identyczny jak przed umieszczeniem
+        (`storage_state` z `storage.undo_state()` dla reprezentacji, których nie cofa samo `release`).
+        """
+        last_product = self.stored_products.pop()
+        assert last_product is product, "Placements must be reverted in reverse order."
+
+        if storage_state is not None:
+            self.storage.restore_undo_state(storage_state)
+        else:
+            self.storage.release(product.position, product.voxel_dims)
+        self.version = version
+
+    def revert_removal(self, product: Product, index: int, version: int, storage_state=None) -> None:
+        """
+        Cofa zdjęcie produktu: wraca on na swoją pozycję (zapisaną w produkcie) i miejsce `index`
+        w `stored_products`, a półka odzyskuje wcześniejszą wersję. Używane przez PlacementSession.
+        """
+        if storage_state is not None:
+            self.storage.restore_undo_state(storage_state)
+        else:
+            self.storage.occupy(product.position, product.voxel_dims)
+        self.stored_products.insert(index, product)
+        self.version = version
+    
     def reset(self) -> None:
 
         for product in self.stored_products:
             product.reset()
 
         self.stored_products = []
-        self.voxel_grid.fill(0)
-        self.occupied_voxels_count = 0
+        self.storage.reset()
+        self.version = next(_state_versions)
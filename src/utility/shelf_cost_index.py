@@ -0,0 +1,149 @@
+import itertools
+import numpy as np
+from utility.shelf import Shelf
+from utility.warehouse_tensor import shelf_costs
+
+class ShelfCostIndex:
+    """
+    Półki uporządkowane rosnąco po koszcie (access_cost + operational_cost) z drzewem przedziałowym
+    nad agregatami wolnego miejsca. Węzeł przechowuje maksima po swoich półkach:
+    - liczby wolnych wokseli,
+    - górnego ograniczenia `free_run(b, c)` dla każdego przekroju b x c.
+    `first_fit` schodzi więc tylko do poddrzew, w których jakaś półka może pomieścić produkt.
+
+    Po zmianie półki ograniczenie przekrojów bierze się z tanich agregatów - najdłuższych wolnych serii
+    wzdłuż osi (`free_extents`): free_run(b, c) <= seria x, a 0, gdy b lub c przekracza serię y lub z.
+    Dokładna wartość przekroju jest liczona leniwie, dopiero gdy ograniczenie przepuści produkt,
+    i od razu zaostrza drzewo - ta sama półka nie jest skanowana ponownie dla tego przekroju.
+
+    Agregaty pamiętają wersję półki: `sync` przelicza tylko półki zmienione od ostatniego
+    odczytu (umieszczenia, usunięcia, cofnięte sesje), więc indeks może żyć między epokami.
+    """
+
+    def __init__(self, shelves: list[Shelf]):
+
+        self.shelves: list[Shelf] = shelves
+        self.order: np.ndarray = np.argsort(shelf_costs(shelves), kind="stable")
+        self.sorted_shelves: list[Shelf] = [shelves[i] for i in self.order]
+
+        count = len(shelves)
+        _gx, gy, gz = Shelf.grid_dimension
+        self._size: int = 1 << max(count - 1, 0).bit_length()
+        # Liście od indeksu `_size`; puste liście mają agregaty -1 i nigdy nie przechodzą testu
+        self._free: np.ndarray = np.full(2 * self._size, -1.0)
+        self._runs: np.ndarray = np.full((2 * self._size, gy, gz), -1, dtype=np.int32)
+        self._rotating: np.ndarray = np.zeros(2 * self._size, dtype=bool)
+        self._exact: np.ndarray = np.zeros((count, gy, gz), dtype=bool)
+        self._extents: np.ndarray = np.zeros((count, 3), dtype=np.int32)
+        self._versions: np.ndarray = np.zeros(count, dtype=np.int64)
+        self._sections: tuple[np.ndarray, np.ndarray] = np.meshgrid(np.arange(1, gy + 1), np.arange(1, gz + 1), indexing="ij")
+
+        self._rotating[self._size:self._size + count] = [shelf.allow_rotation for shelf in self.sorted_shelves]
+        for node in range(self._size - 1, 0, -1):
+            self._rotating[node] = self._rotating[2 * node] or self._rotating[2 * node + 1]
+
+        self.refreshed: int = 0
+        self.exact_runs: int = 0
+        self.sync()
+
+    def covers(self, shelves: list[Shelf]) -> bool:
+        """Czy indeks został zbudowany dla dokładnie tych półek (tych samych obiektów, w tej samej kolejności)."""
+        return len(shelves) == len(self.shelves) and all(a is b for a, b in zip(shelves, self.shelves))
+
+    def sync(self) -> None:
+        """Przelicza agregaty półek, których wersja zmieniła się od ostatniego odczytu."""
+        versions = np.fromiter((shelf.version for shelf in self.sorted_shelves), dtype=np.int64, count=len(self.sorted_shelves))
+        changed = np.flatnonzero(versions != self._versions)
+        if len(changed):
+            self._update(changed, versions[changed])
+
+    def refresh(self, position: int) -> None:
+        """Przelicza agregaty jednej półki (pozycja w kolejności kosztu) po zmianie jej zawartości."""
+        self._update(np.array([position]), np.array([self.sorted_shelves[position].version]))
+
+    def _update(self, positions: np.ndarray, versions: np.ndarray) -> None:
+
+        sections_b, sections_c = self._sections
+        for position in positions.tolist():
+            storage = self.sorted_shelves[position].storage
+            extent_x, extent_y, extent_z = self._extents[position] = storage.free_extents()
+            self._free[self._size + position] = Shelf.total_voxels - storage.occupied_voxels
+            self._runs[self._size + position] = np.where((sections_b <= extent_y) & (sections_c <= extent_z), extent_x, 0)
+        self._exact[positions] = False
+        self._versions[positions] = versions
+        self.refreshed += len(positions)
+
+        # Przeliczenie przodków zmienionych liści, poziom po poziomie
+        if len(positions) == 1:
+            node = (self._size + int(positions[0])) // 2
+            while node >= 1:
+                self._free[node] = max(self._free[2 * node], self._free[2 * node + 1])
+                np.maximum(self._runs[2 * node], self._runs[2 * node + 1], out=self._runs[node])
+                node //= 2
+            return
+
+        nodes = np.unique((self._size + positions) // 2)
+        while len(nodes) and nodes[0] >= 1:
+            self._free[nodes] = np.maximum(self._free[2 * nodes], self._free[2 * nodes + 1])
+            self._runs[nodes] = np.maximum(self._runs[2 * nodes], self._runs[2 * nodes + 1])
+            nodes = np.unique(nodes // 2)
+            nodes = nodes[nodes >= 1]
+
+    def _tighten(self, position: int, b: int, c: int) -> int:
+        """Dokładne `free_run(b, c)` półki; wpis liścia i jego przodków jest zaostrzany."""
+        run = self.sorted_shelves[position].storage.free_run(b, c)
+        self._exact[position, b - 1, c - 1] = True
+        self.exact_runs += 1
+
+        node = self._size + position
+        self._runs[node, b - 1, c - 1] = run
+        node //= 2
+        while node >= 1:
+            self._runs[node, b - 1, c - 1] = max(self._runs[2 * node, b - 1, c - 1], self._runs[2 * node + 1, b - 1, c - 1])
+            node //= 2
+        return run
+
+    def _may_fit(self, node: int, orientations: list[tuple[int, int, int]], primary: list[tuple[int, int, int]]) -> bool:
+
+        runs = self._runs[node]
+        return any(runs[b - 1, c - 1] >= a for a, b, c in (orientations if self._rotating[node] else primary))
+
+    def _leaf_fits(self, position: int, orientations: list[tuple[int, int, int]], primary: list[tuple[int, int, int]]) -> bool:
+
+        node = self._size + position
+        for a, b, c in (orientations if self._rotating[node] else primary):
+            if self._runs[node, b - 1, c - 1] < a:
+                continue
+            if self._exact[position, b - 1, c - 1] or self._tighten(position, b, c) >= a:
+                return True
+        return False
+
+    def first_fit(self, voxel_dims: tuple[int, int, int], volume: float, start: int = 0) -> int:
+        """
+        Pierwsza pozycja (w kolejności kosztu) od `start`, na której półka może pomieścić prostopadłościan
+        `voxel_dims` o objętości `volume`, albo -1. Dla gęstej reprezentacji wynik jest dokładny,
+        dla punktów ekstremalnych to warunek konieczny - umieszczenie może się jeszcze nie udać.
+        Półki z `allow_rotation` sprawdzają wszystkie orientacje.
+        """
+        _gx, gy, gz = Shelf.grid_dimension
+        orientations = [
+            (a, b, c) for a, b, c in dict.fromkeys(itertools.permutations(voxel_dims))
+            if a >= 1 and 1 <= b <= gy and 1 <= c <= gz
+        ]
+        # Półki bez obrotów sprawdzają tylko orientację podstawową (o ile mieści się w siatce)
+        primary = orientations[:1] if orientations and orientations[0] == tuple(voxel_dims) else []
+
+        stack = [(1, 0, self._size)]
+        while stack:
+            node, lo, hi = stack.pop()
+            if hi <= start or self._free[node] < volume or not self._may_fit(node, orientations, primary):
+                continue
+            if hi - lo == 1:
+                if self._leaf_fits(lo, orientations, primary):
+                    return lo
+                continue
+            middle = (lo + hi) // 2
+            stack.append((2 * node + 1, middle, hi))
+            stack.append((2 * node, lo, middle))
+
+        return -1
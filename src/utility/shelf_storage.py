@@ -0,0 +1,596 @@
+import abc
+import itertools
+import numpy as np
+
+class ShelfStorage(abc.ABC):
+    """
+    Reprezentacja zajętości przestrzeni półki. Półka deleguje do niej wszystkie
+    zapytania o wolne miejsce oraz zapełnianie i zwalnianie prostopadłościanów.
+    """
+
+    # Czy pozycje i wymiary są ciągłe (float), a nie całkowitymi indeksami wokseli
+    continuous: bool = False
+
+    def __init__(self, grid_dimension: tuple[int, int, int]):
+
+        self.grid_dimension: tuple[int, int, int] = grid_dimension
+        self.occupied_voxels: int = 0
+
+    @abc.abstractmethod
+    def find_position(self, voxel_dims: tuple[int, int, int]) -> tuple[int, int, int] | None:
+        """Zwraca pierwszą wolną pozycję w kolejności z, y, x lub None."""
+        pass
+
+    @abc.abstractmethod
+    def is_free(self, position: tuple[int, int, int], voxel_dims: tuple[int, int, int]) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def occupy(self, position: tuple[int, int, int], voxel_dims: tuple[int, int, int]) -> None:
+        pass
+
+    @abc.abstractmethod
+    def release(self, position: tuple[int, int, int], voxel_dims: tuple[int, int, int]) -> None:
+        pass
+
+    @abc.abstractmethod
+    def reset(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def to_dense(self) -> np.ndarray:
+        """Zwraca gęstą siatkę wokseli (0 - wolny, 1 - zajęty)."""
+        pass
+
+    @property
+    @abc.abstractmethod
+    def nbytes(self) -> int:
+        pass
+
+    def find_position_any_orientation(self, voxel_dims: tuple[int, int, int]) -> tuple[tuple[int, int, int], tuple[int, int, int]] | None:
+        """
+        Sprawdza wszystkie osiowe orientacje produktu (po jednym przejściu na orientację)
+        i zwraca najlepszą parę (pozycja, wymiary w tej orientacji): najniższą w kolejności z, y, x,
+        a przy remisie - wcześniejszą orientację (pierwsza jest orientacja natywna).
+        """
+        best = None
+        for orientation in dict.fromkeys(itertools.permutations(voxel_dims)):
+            position = self.find_position(orientation)
+            if position is None:
+                continue
+            x, y, z = position
+            if best is None or (z, y, x) < best[0]:
+                best = ((z, y, x), position, orientation)
+
+        if best is None:
+            return None
+        return best[1], best[2]
+
+    def free_run(self, b: int, c: int) -> int:
+        """
+        Najdłuższa seria wokseli wzdłuż x, w której przekrój b x c (y, z) jest w całości wolny.
+        Prostopadłościan (a, b, c) mieści się na półce wtedy i tylko wtedy, gdy a <= free_run(b, c).
+        """
+        return longest_free_run(box_sums(summed_area_table(self.to_dense()), (1, b, c)))
+
+    def free_extents(self) -> tuple[int, int, int]:
+        """
+        Najdłuższa wolna seria wokseli wzdłuż każdej z osi (x, y, z). Prostopadłościan (a, b, c)
+        może się zmieścić tylko wtedy, gdy a, b i c nie przekraczają odpowiednich serii.
+        """
+        occupied = self.to_dense()
+        return tuple(longest_free_run(np.moveaxis(occupied, axis, 0)) for axis in range(3))
+
+    def product_dims(self, product) -> tuple[int, int, int]:
+        """Wymiary produktu w jednostkach, w których pracuje dana reprezentacja."""
+        return product.dims_in_voxels()
+
+    def export_state(self) -> dict[str, np.ndarray]:
+        """Dodatkowy stan reprezentacji, którego nie da się odtworzyć z siatki i listy pudełek (np. dla punktu kontrolnego)."""
+        return {}
+
+    def import_state(self, state: dict[str, np.ndarray]) -> None:
+        """Odwrotność `export_state` - wywoływana po ponownym umieszczeniu wszystkich pudełek."""
+        pass
+
+    def undo_state(self):
+        """
+        Stan potrzebny do dokładnego cofnięcia zmiany (np. przez PlacementSession) albo None,
+        jeśli cofnięcie przez `release`/`occupy` odtwarza reprezentację w całości.
+        """
+        return None
+
+    def restore_undo_state(self, state) -> None:
+        """Odwrotność `undo_state` - przywraca reprezentację sprzed zmiany."""
+        pass
+
+    def _fits_grid(self, voxel_dims: tuple[int, int, int]) -> bool:
+
+        return all(0 < p <= g for p, g in zip(voxel_dims, self.grid_dimension))
+
+
+def summed_area_table(grid: np.ndarray) -> np.ndarray:
+
+    table = np.zeros(tuple(d + 1 for d in grid.shape), dtype=np.int32)
+    table[1:, 1:, 1:] = grid.cumsum(axis=0, dtype=np.int32).cumsum(axis=1).cumsum(axis=2)
+    return table
+
+def box_sums(table: np.ndarray, voxel_dims: tuple[int, int, int]) -> np.ndarray:
+    """Suma wokseli w prostopadłościanie `voxel_dims` dla każdego przesunięcia, na podstawie tablicy sum prefiksowych."""
+    px, py, pz = voxel_dims
+    gx, gy, gz = (d - 1 for d in table.shape)
+
+    s = table
+    x0, x1 = slice(0, gx - px + 1), slice(px, gx + 1)
+    y0, y1 = slice(0, gy - py + 1), slice(py, gy + 1)
+    z0, z1 = slice(0, gz - pz + 1), slice(pz, gz + 1)
+
+    return (s[x1, y1, z1] - s[x0, y1, z1] - s[x1, y0, z1] - s[x1, y1, z0]
+            + s[x0, y0, z1] + s[x0, y1, z0] + s[x1, y0, z0] - s[x0, y0, z0])
+
+def longest_free_run(occupied: np.ndarray) -> int:
+    """Najdłuższa seria kolejnych zer wzdłuż osi 0 (x), dla dowolnej pozycji w pozostałych osiach."""
+    if occupied.size == 0:
+        return 0
+
+    free = occupied == 0
+    count = np.cumsum(free, axis=0, dtype=np.int32)
+    last_reset = np.maximum.accumulate(np.where(free, 0, count), axis=0)
+    return int((count - last_reset).max())
+
+
+class DenseStorage(ShelfStorage):
+    """
+    Gęsta siatka `int8` wraz z tablicą sum prefiksowych (summed-area table),
+    dzięki której pytanie "czy ten prostopadłościan jest pusty?" kosztuje O(1).
+    """
+
+    def __init__(self,
+                 grid_dimension: tuple[int, int, int],
+                 voxel_grid: np.ndarray | None = None,
+                 occupancy_index: np.ndarray | None = None,
+                 counter: np.ndarray | None = None):
+        """
+        Bufory można przekazać z zewnątrz (np. widoki na wspólny tensor całego magazynu,
+        patrz WarehouseTensor) - wtedy półka nie alokuje własnej pamięci.
+        """
+        self._counter: np.ndarray = counter if counter is not None else np.zeros(1, dtype=np.int64)
+        super().__init__(grid_dimension)
+        self.voxel_grid: np.ndarray = voxel_grid if voxel_grid is not None else np.zeros(grid_dimension, dtype=np.int8)
+        self.occupancy_index: np.ndarray = (
+            occupancy_index if occupancy_index is not None
+            else np.zeros(tuple(d + 1 for d in grid_dimension), dtype=np.int32)
+        )
+        self.tensor = None
+
+    def __getstate__(self) -> dict:
+        # Kopia (deepcopy, pickle) ma własne bufory, więc nie jest już częścią wspólnego tensora
+        state = self.__dict__.copy()
+        state["tensor"] = None
+        return state
+
+    @property
+    def occupied_voxels(self) -> int:
+        return int(self._counter[0])
+
+    @occupied_voxels.setter
+    def occupied_voxels(self, value: int) -> None:
+        self._counter[0] = value
+
+    def box_occupancy(self, voxel_dims: tuple[int, int, int]) -> np.ndarray:
+        """
+        Zwraca liczbę zajętych wokseli w prostopadłościanie o podanym rozmiarze
+        dla każdego możliwego przesunięcia (x, y, z) - jedno przejście po tablicy sum prefiksowych.
+        """
+        if not self._fits_grid(voxel_dims):
+            return np.zeros((0, 0, 0), dtype=self.occupancy_index.dtype)
+
+        return box_sums(self.occupancy_index, voxel_dims)
+
+    def free_run(self, b: int, c: int) -> int:
+
+        return longest_free_run(self.box_occupancy((1, b, c)))
+
+    def find_position(self, voxel_dims: tuple[int, int, int]) -> tuple[int, int, int] | None:
+
+        free = self.box_occupancy(voxel_dims) == 0
+        if not free.any():
+            return None
+
+        # Kolejność przeszukiwania: najpierw z, potem y, na końcu x (najniżej, najbliżej krawędzi)
+        free_zyx = free.transpose(2, 1, 0)
+        z, y, x = np.unravel_index(int(np.argmax(free_zyx)), free_zyx.shape)
+
+        return (int(x), int(y), int(z))
+
+    def is_free(self, position: tuple[int, int, int], voxel_dims: tuple[int, int, int]) -> bool:
+
+        x, y, z = position
+        px, py, pz = voxel_dims
+        s = self.occupancy_index
+
+        occupied = (s[x+px, y+py, z+pz] - s[x, y+py, z+pz] - s[x+px, y, z+pz] - s[x+px, y+py, z]
+                    + s[x, y, z+pz] + s[x, y+py, z] + s[x+px, y, z] - s[x, y, z])
+        return occupied == 0
+
+    def occupy(self, position: tuple[int, int, int], voxel_dims: tuple[int, int, int]) -> None:
+
+        x, y, z = position
+        px, py, pz = voxel_dims
+        self.voxel_grid[x:x+px, y:y+py, z:z+pz] = 1
+        self._update_occupancy_index(position, voxel_dims, 1)
+        self.occupied_voxels += px * py * pz
+
+    def release(self, position: tuple[int, int, int], voxel_dims: tuple[int, int, int]) -> None:
+
+        x, y, z = position
+        px, py, pz = voxel_dims
+        self.voxel_grid[x:x+px, y:y+py, z:z+pz] = 0
+        self._update_occupancy_index(position, voxel_dims, -1)
+        self.occupied_voxels -= px * py * pz
+
+    def reset(self) -> None:
+
+        self.voxel_grid.fill(0)
+        self.occupancy_index.fill(0)
+        self.occupied_voxels = 0
+
+    def to_dense(self) -> np.ndarray:
+
+        return self.voxel_grid
+
+    @property
+    def nbytes(self) -> int:
+
+        return self.voxel_grid.nbytes + self.occupancy_index.nbytes
+
+    def _update_occupancy_index(self, position: tuple[int, int, int], voxel_dims: tuple[int, int, int], value: int) -> None:
+        """Aktualizuje tablicę sum prefiksowych po zapełnieniu (value=1) lub zwolnieniu (value=-1) prostopadłościanu."""
+        x, y, z = position
+        px, py, pz = voxel_dims
+        gx, gy, gz = self.grid_dimension
+
+        cx = np.minimum(np.arange(1, gx - x + 1), px)
+        cy = np.minimum(np.arange(1, gy - y + 1), py)
+        cz = np.minimum(np.arange(1, gz - z + 1), pz)
+
+        self.occupancy_index[x+1:, y+1:, z+1:] += value * (cx[:, None, None] * cy[None, :, None] * cz[None, None, :])
+
+
+class BitPackedStorage(ShelfStorage):
+    """
+    Zajętość upakowana bitowo: jedno słowo `uint64` na każdą kolumnę (y, z),
+    bit x oznacza zajęty woksel. Zapytania o miejsce działają bezpośrednio na bitach.
+    """
+
+    word_bits: int = 64
+
+    def __init__(self, grid_dimension: tuple[int, int, int]):
+
+        super().__init__(grid_dimension)
+        gx, gy, gz = grid_dimension
+        if gx > BitPackedStorage.word_bits:
+            raise ValueError(f"Bit-packed storage supports at most {BitPackedStorage.word_bits} voxels along x, got {gx}.")
+
+        self.bits: np.ndarray = np.zeros((gy, gz), dtype=np.uint64)
+        self._full_mask = np.uint64((1 << gx) - 1)
+
+    def _box_mask(self, x: int, px: int) -> np.uint64:
+
+        return np.uint64(((1 << px) - 1) << x)
+
+    def _free_starts(self, voxel_dims: tuple[int, int, int]) -> np.ndarray:
+        """
+        Dla każdej pozycji (y, z) zwraca słowo, w którym bit x jest ustawiony,
+        jeśli prostopadłościan zaczynający się w (x, y, z) jest wolny.
+        """
+        px, py, pz = voxel_dims
+        _gx, gy, gz = self.grid_dimension
+
+        free = ~self.bits & self._full_mask
+
+        # Serie wolnych bitów długości px metodą podwajania
+        runs, length = free, 1
+        while 2 * length <= px:
+            runs = runs & (runs >> np.uint64(length))
+            length *= 2
+        if length < px:
+            runs = runs & (runs >> np.uint64(px - length))
+
+        window = runs[:gy - py + 1, :]
+        for dy in range(1, py):
+            window = window & runs[dy:dy + gy - py + 1, :]
+
+        starts = window[:, :gz - pz + 1]
+        for dz in range(1, pz):
+            starts = starts & window[:, dz:dz + gz - pz + 1]
+
+        return starts
+
+    def find_position(self, voxel_dims: tuple[int, int, int]) -> tuple[int, int, int] | None:
+
+        if not self._fits_grid(voxel_dims):
+            return None
+
+        starts_zy = self._free_starts(voxel_dims).T
+        nonzero = starts_zy != 0
+        if not nonzero.any():
+            return None
+
+        z, y = np.unravel_index(int(np.argmax(nonzero)), nonzero.shape)
+        word = int(starts_zy[z, y])
+        x = (word & -word).bit_length() - 1
+
+        return (x, int(y), int(z))
+
+    def free_run(self, b: int, c: int) -> int:
+
+        if not self._fits_grid((1, b, c)):
+            return 0
+
+        # Podwajanie długości serii, a następnie dokładanie kolejnych potęg dwójki (od największej)
+        powers = [self._free_starts((1, b, c))]
+        while powers[-1].any() and 2 ** len(powers) <= self.grid_dimension[0]:
+            step = np.uint64(2 ** (len(powers) - 1))
+            powers.append(powers[-1] & (powers[-1] >> step))
+
+        if not powers[0].any():
+            return 0
+
+        longest = 2 ** (len(powers) - 1) if powers[-1].any() else 2 ** (len(powers) - 2)
+        runs = powers[-1] if powers[-1].any() else powers[-2]
+        for k in range(len(powers) - 2, -1, -1):
+            extended = runs & (powers[k] >> np.uint64(longest))
+            if extended.any():
+                runs, longest = extended, longest + 2 ** k
+
+        return longest
+
+    def is_free(self, position: tuple[int, int, int], voxel_dims: tuple[int, int, int]) -> bool:
+
+        x, y, z = position
+        px, py, pz = voxel_dims
+        return not np.any(self.bits[y:y+py, z:z+pz] & self._box_mask(x, px))
+
+    def occupy(self, position: tuple[int, int, int], voxel_dims: tuple[int, int, int]) -> None:
+
+        x, y, z = position
+        px, py, pz = voxel_dims
+        self.bits[y:y+py, z:z+pz] |= self._box_mask(x, px)
+        self.occupied_voxels += px * py * pz
+
+    def release(self, position: tuple[int, int, int], voxel_dims: tuple[int, int, int]) -> None:
+
+        x, y, z = position
+        px, py, pz = voxel_dims
+        self.bits[y:y+py, z:z+pz] &= ~self._box_mask(x, px)
+        self.occupied_voxels -= px * py * pz
+
+    def reset(self) -> None:
+
+        self.bits.fill(0)
+        self.occupied_voxels = 0
+
+    def to_dense(self) -> np.ndarray:
+
+        gx = self.grid_dimension[0]
+        shifts = np.arange(gx, dtype=np.uint64)[:, None, None]
+        return ((self.bits[None, :, :] >> shifts) & np.uint64(1)).astype(np.int8)
+
+    @property
+    def nbytes(self) -> int:
+
+        return self.bits.nbytes
+
+
+class ExtremePointStorage(ShelfStorage):
+    """
+    Ciągła reprezentacja półki oparta o punkty ekstremalne (extreme points).
+    Produkty nie są zaokrąglane do wokseli - wymiary i pozycje są liczbami
+    zmiennoprzecinkowymi wyrażonymi w jednostkach woksela, a wstawienie sprawdza
+    tylko kilka narożników kandydujących zamiast całej siatki.
+    """
+
+    eps: float = 1e-9
+    continuous: bool = True
+
+    def __init__(self, grid_dimension: tuple[int, int, int]):
+
+        super().__init__(grid_dimension)
+        self.occupied_voxels: float = 0.0
+        self._extent = np.array(grid_dimension, dtype=np.float64)
+        self.extreme_points: np.ndarray = np.zeros((1, 3), dtype=np.float64)
+        self.box_min: np.ndarray = np.zeros((0, 3), dtype=np.float64)
+        self.box_max: np.ndarray = np.zeros((0, 3), dtype=np.float64)
+        # Punkty ekstremalne sprzed wstawienia każdego pudełka - pozwalają dokładnie cofnąć ostatnie wstawienie
+        self._ep_history: list[np.ndarray] = []
+
+    def product_dims(self, product) -> tuple[float, float, float]:
+
+        return tuple(d / product.voxel_size for d in product.dimensions)
+
+    def _feasible(self, origins: np.ndarray, dims: np.ndarray) -> np.ndarray:
+
+        ends = origins + dims
+        inside = np.all(origins >= -self.eps, axis=1) & np.all(ends <= self._extent + self.eps, axis=1)
+        if len(self.box_min) == 0:
+            return inside
+
+        overlap = np.all(
+            (origins[:, None, :] < self.box_max[None, :, :] - self.eps)
+            & (ends[:, None, :] > self.box_min[None, :, :] + self.eps),
+            axis=2
+        )
+        return inside & ~overlap.any(axis=1)
+
+    def find_position(self, voxel_dims: tuple[float, float, float]) -> tuple[float, float, float] | None:
+
+        candidates = self.extreme_points
+        feasible = self._feasible(candidates, np.asarray(voxel_dims, dtype=np.float64))
+        if not feasible.any():
+            return None
+
+        # Taka sama kolejność jak w reprezentacjach wokselowych: z, potem y, potem x
+        points = candidates[feasible]
+        best = np.lexsort((points[:, 0], points[:, 1], points[:, 2]))[0]
+
+        return tuple(float(c) for c in points[best])
+
+    def is_free(self, position: tuple[float, float, float], voxel_dims: tuple[float, float, float]) -> bool:
+
+        origin = np.asarray(position, dtype=np.float64)[None, :]
+        return bool(self._feasible(origin, np.asarray(voxel_dims, dtype=np.float64))[0])
+
+    def _project(self, point: np.ndarray, axis: int) -> np.ndarray:
+        """Przesuwa punkt wzdłuż osi `axis` w stronę zera, aż oprze się o pudełko lub ścianę półki."""
+        others = [a for a in range(3) if a != axis]
+        supports = (
+            np.all(self.box_min[:, others] <= point[others] + self.eps, axis=1)
+            & np.all(self.box_max[:, others] > point[others] + self.eps, axis=1)
+            & (self.box_max[:, axis] <= point[axis] + self.eps)
+        )
+        projected = point.copy()
+        projected[axis] = self.box_max[supports, axis].max() if supports.any() else 0.0
+        return projected
+
+    def occupy(self, position: tuple[float, float, float], voxel_dims: tuple[float, float, float]) -> None:
+
+        origin = np.asarray(position, dtype=np.float64)
+        dims = np.asarray(voxel_dims, dtype=np.float64)
+
+        self._ep_history.append(self.extreme_points)
+        self.box_min = np.vstack([self.box_min, origin])
+        self.box_max = np.vstack([self.box_max, origin + dims])
+        self.occupied_voxels += float(np.prod(dims))
+
+        new_points = []
+        for axis in range(3):
+            corner = origin.copy()
+            corner[axis] += dims[axis]
+            new_points.append(corner)
+            for projection_axis in range(3):
+                if projection_axis != axis:
+                    new_points.append(self._project(corner, projection_axis))
+
+        points = np.vstack([self.extreme_points, np.array(new_points)])
+        self._set_extreme_points(points)
+
+    def release(self, position: tuple[float, float, float], voxel_dims: tuple[float, float, float]) -> None:
+
+        origin = np.asarray(position, dtype=np.float64)
+        matches = np.flatnonzero(np.all(np.abs(self.box_min - origin) <= self.eps, axis=1))
+        if len(matches) == 0:
+            return
+
+        index = int(matches[-1])
+        self.box_min = np.delete(self.box_min, index, axis=0)
+        self.box_max = np.delete(self.box_max, index, axis=0)
+        self.occupied_voxels -= float(np.prod(np.asarray(voxel_dims, dtype=np.float64)))
+
+        restored = self._ep_history.pop(index)
+        if index == len(self._ep_history):
+            # Cofnięcie ostatniego wstawienia - przywracamy dokładnie poprzedni stan
+            self.extreme_points = restored
+        else:
+            self._ep_history[index:] = [np.vstack([h, origin]) for h in self._ep_history[index:]]
+            self._set_extreme_points(np.vstack([self.extreme_points, origin]))
+
+    def undo_state(self) -> tuple:
+        """
+        Zdjęcie pudełka ze środka listy i ponowne wstawienie go na koniec zmienia kolejność pudełek
+        i zbiór punktów ekstremalnych, więc do cofnięcia zapisujemy cały stan. Tablice nie są
+        modyfikowane w miejscu (tylko podmieniane), wystarczą więc referencje i kopia listy historii.
+        """
+        return self.extreme_points, self.box_min, self.box_max, list(self._ep_history), self.occupied_voxels
+
+    def restore_undo_state(self, state: tuple) -> None:
+
+        self.extreme_points, self.box_min, self.box_max, history, self.occupied_voxels = state
+        self._ep_history = list(history)
+
+    def export_state(self) -> dict[str, np.ndarray]:
+
+        return {
+            "extreme_points": self.extreme_points,
+            "ep_history": np.vstack(self._ep_history) if self._ep_history else np.zeros((0, 3), dtype=np.float64),
+            "ep_history_sizes": np.array([len(h) for h in self._ep_history], dtype=np.int64),
+        }
+
+    def import_state(self, state: dict[str, np.ndarray]) -> None:
+
+        self.extreme_points = np.array(state["extreme_points"], dtype=np.float64)
+        splits = np.cumsum(state["ep_history_sizes"])[:-1]
+        history = np.array(state["ep_history"], dtype=np.float64)
+        self._ep_history = np.split(history, splits) if len(state["ep_history_sizes"]) else []
+
+    def _set_extreme_points(self, points: np.ndarray) -> None:
+
+        points = np.unique(np.round(points, 9), axis=0)
+        inside = np.all(points < self._extent - self.eps, axis=1)
+        if len(self.box_min):
+            covered = np.all(
+                (points[:, None, :] >= self.box_min[None, :, :] - self.eps)
+                & (points[:, None, :] < self.box_max[None, :, :] - self.eps),
+                axis=2
+            ).any(axis=1)
+            inside &= ~covered
+        self.extreme_points = points[inside]
+
+    def reset(self) -> None:
+
+        self.occupied_voxels = 0.0
+        self.extreme_points = np.zeros((1, 3), dtype=np.float64)
+        self.box_min = np.zeros((0, 3), dtype=np.float64)
+        self.box_max = np.zeros((0, 3), dtype=np.float64)
+        self._ep_history = []
+
+    def to_dense(self) -> np.ndarray:
+
+        grid = np.zeros(self.grid_dimension, dtype=np.int8)
+        lo = np.floor(self.box_min + self.eps).astype(int)
+        hi = np.ceil(self.box_max - self.eps).astype(int)
+        for (x0, y0, z0), (x1, y1, z1) in zip(lo, hi):
+            grid[x0:x1, y0:y1, z0:z1] = 1
+        return grid
+
+    def free_run(self, b: int, c: int) -> int:
+        """
+        Woksel uznajemy za zajęty tylko wtedy, gdy w całości pokrywa go jedno pudełko,
+        więc wynik jest górnym ograniczeniem - nie odrzuca półek, na których produkt
+        o wymiarach `dims_in_voxels()` mógłby się jeszcze zmieścić.
+        """
+        if not self._fits_grid((1, b, c)):
+            return 0
+        return longest_free_run(box_sums(summed_area_table(self._covered_voxels()), (1, b, c)))
+
+    def free_extents(self) -> tuple[int, int, int]:
+        """Jak `free_run` - górne ograniczenie liczone na wokselach pokrytych w całości."""
+        occupied = self._covered_voxels()
+        return tuple(longest_free_run(np.moveaxis(occupied, axis, 0)) for axis in range(3))
+
+    def _covered_voxels(self) -> np.ndarray:
+        """Siatka wokseli, które w całości pokrywa jakieś pudełko."""
+        grid = np.zeros(self.grid_dimension, dtype=np.int8)
+        lo = np.ceil(self.box_min - self.eps).astype(int)
+        hi = np.floor(self.box_max + self.eps).astype(int)
+        for (x0, y0, z0), (x1, y1, z1) in zip(lo, hi):
+            grid[x0:x1, y0:y1, z0:z1] = 1
+        return grid
+
+    @property
+    def nbytes(self) -> int:
+
+        return self.extreme_points.nbytes + self.box_min.nbytes + self.box_max.nbytes + sum(h.nbytes for h in self._ep_history)
+
+
+STORAGE_TYPES: dict[str, type[ShelfStorage]] = {
+    "dense": DenseStorage,
+    "bitpacked": BitPackedStorage,
+    "extreme_points": ExtremePointStorage,
+}
+
+def make_storage(storage: str, grid_dimension: tuple[int, int, int]) -> ShelfStorage:
+
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"Unknown shelf storage '{storage}'. Available: {', '.join(STORAGE_TYPES)}.")
+    return STORAGE_TYPES[storage](grid_dimension)
@@ -1,24 +1,38 @@
 from utility.shelf import Shelf
 from utility.rack import Rack
+from utility.warehouse_tensor import WarehouseTensor
 
 class WarehouseFactory():
     
-    def __init__(self, rack_count: int = 10, shelf_count: int = 4):
+    def __init__(self, rack_count: int = 10, shelf_count: int = 4, storage: str = "dense", allow_rotation: bool = False):
         
         self.rack_count = rack_count
         self.shelf_count = shelf_count
+        self.storage = storage
+        self.allow_rotation = allow_rotation
     
-    def make_racks(self):
+    def make_racks(self, contiguous: bool = False):
+        """
+        Tworzy regały z półkami. Przy `contiguous=True` wszystkie półki korzystają z widoków
+        na jeden wspólny tensor wokseli (WarehouseTensor) zamiast z osobnych tablic.
+        """
+        tensor: WarehouseTensor | None = None
+        if contiguous:
+            if self.storage != "dense":
+                raise ValueError(f"Contiguous warehouse tensor requires dense shelf storage, got '{self.storage}'.")
+            tensor = WarehouseTensor(self.rack_count * self.shelf_count)
 
         racks: list[Rack] = []
         
         for i in range(0, self.rack_count):
-            rack = self.__make_rack(rack_index=i)
+            rack = self.__make_rack(rack_index=i, tensor=tensor)
             racks.append(rack)
+            if tensor is not None:
+                tensor.register_rack(rack)
         
         return racks
     
-    def __make_rack(self, rack_index: int) -> Rack:
+    def __make_rack(self, rack_index: int, tensor: WarehouseTensor | None = None) -> Rack:
         
         rack = Rack(f"R{rack_index}")
         
@@ -27,16 +41,23 @@ class WarehouseFactory():
                 rack_index=rack_index,
                 shelf_index=i,
                 access_cost=(rack_index+1)*100,
-                additional_cost=(i+1)*10
+                additional_cost=(i+1)*10,
+                tensor=tensor
                 )
             rack.add_shelf(shelf)
             
         return rack
             
-    def __make_shelf(self, rack_index: int, shelf_index: int, access_cost: float, additional_cost: float) -> Shelf:
+    def __make_shelf(self, rack_index: int, shelf_index: int, access_cost: float, additional_cost: float, tensor: WarehouseTensor | None = None) -> Shelf:
 
-        return Shelf(
+        shelf = Shelf(
             shelf_id=f"R{rack_index}-S{shelf_index}",
             access_cost=access_cost,
-            operational_cost=additional_cost
-        )
\ No newline at end of file
+            operational_cost=additional_cost,
+            storage=tensor.make_storage(len(tensor.shelves)) if tensor is not None else self.storage,
+            allow_rotation=self.allow_rotation
+        )
+        if tensor is not None:
+            tensor.register(shelf)
+
+        return shelf
\ No newline at end of file
@@ -0,0 +1,105 @@
+import itertools
+import numpy as np
+from utility.shelf import Shelf
+
+class WarehouseIndex:
+    """
+    Indeks wolnej przestrzeni dla zbioru półek. Dla każdej półki i każdego przekroju b x c
+    przechowuje najdłuższą wolną serię wzdłuż x (ShelfStorage.free_run), dzięki czemu pytanie
+    "na których półkach zmieści się prostopadłościan (a, b, c)?" to jedno porównanie wektorowe.
+    Każdy wpis pamięta wersję półki, dla której został policzony, i jest przeliczany leniwie
+    dopiero wtedy, gdy wersja półki jest inna (np. po cofnięciu sesji próbnej wpisy znów są ważne).
+    """
+
+    def __init__(self, shelves: list[Shelf]):
+
+        self.shelves: list[Shelf] = shelves
+        _gx, gy, gz = Shelf.grid_dimension
+
+        self.free_runs: np.ndarray = np.zeros((len(shelves), gy, gz), dtype=np.int32)
+        self.allow_rotation: np.ndarray = np.array([shelf.allow_rotation for shelf in shelves], dtype=bool)
+        self._entry_versions: np.ndarray = np.zeros((len(shelves), gy, gz), dtype=np.int64)
+        self._versions: np.ndarray = np.zeros(len(shelves), dtype=np.int64)
+
+    def refresh(self) -> None:
+        """Odczytuje aktualne wersje wszystkich półek."""
+        self._versions = np.fromiter((shelf.version for shelf in self.shelves), dtype=np.int64, count=len(self.shelves))
+
+    def _refresh_shelf(self, shelf_idx: int) -> None:
+
+        self._versions[shelf_idx] = self.shelves[shelf_idx].version
+
+    def _is_fresh(self, shelf_indices: np.ndarray, b: int, c: int) -> np.ndarray:
+
+        return self._entry_versions[shelf_indices, b - 1, c - 1] == self._versions[shelf_indices]
+
+    def _orientations(self, voxel_dims: tuple[int, int, int]) -> list[tuple[int, int, int]]:
+
+        return list(dict.fromkeys(itertools.permutations(voxel_dims)))
+
+    def _in_grid(self, voxel_dims: tuple[int, int, int]) -> bool:
+
+        a, b, c = voxel_dims
+        gy, gz = self.free_runs.shape[1:]
+        return a >= 1 and 1 <= b <= gy and 1 <= c <= gz
+
+    def _runs(self, b: int, c: int, shelf_indices: np.ndarray) -> np.ndarray:
+
+        stale = shelf_indices[~self._is_fresh(shelf_indices, b, c)]
+        for shelf_idx in stale:
+            self.free_runs[shelf_idx, b - 1, c - 1] = self.shelves[shelf_idx].storage.free_run(b, c)
+        self._entry_versions[stale, b - 1, c - 1] = self._versions[stale]
+
+        return self.free_runs[shelf_indices, b - 1, c - 1]
+
+    def prepare(self, voxel_dims_list: list[tuple[int, int, int]]) -> None:
+        """Z góry wylicza wpisy potrzebne dla podanych rozmiarów (np. wszystkich produktów partii)."""
+        self.refresh()
+        all_shelves = np.arange(len(self.shelves))
+        sections = {
+            (b, c)
+            for voxel_dims in voxel_dims_list
+            for (a, b, c) in self._orientations(voxel_dims)
+            if self._in_grid((a, b, c))
+        }
+        for b, c in sections:
+            self._runs(b, c, all_shelves)
+
+    def fits_mask(self, voxel_dims: tuple[int, int, int]) -> np.ndarray:
+        """
+        Zwraca maskę logiczną po wszystkich półkach: True, jeśli prostopadłościan o wymiarach
+        `voxel_dims` (w wokselach) mieści się na półce. Dla półek z `allow_rotation`
+        uwzględniane są wszystkie orientacje.
+        """
+        self.refresh()
+        all_shelves = np.arange(len(self.shelves))
+        rotating = np.flatnonzero(self.allow_rotation)
+
+        mask = np.zeros(len(self.shelves), dtype=bool)
+        for orientation_idx, (a, b, c) in enumerate(self._orientations(voxel_dims)):
+            if not self._in_grid((a, b, c)):
+                continue
+            if orientation_idx == 0:
+                mask |= self._runs(b, c, all_shelves) >= a
+            elif len(rotating):
+                mask[rotating] |= self._runs(b, c, rotating) >= a
+
+        return mask
+
+    def can_fit(self, shelf_idx: int, voxel_dims: tuple[int, int, int], refresh: bool = True) -> bool:
+        """
+        Jak `fits_mask`, ale tylko dla jednej półki. Przy `refresh=False` nieaktualne wpisy
+        nie są przeliczane - półka jest wtedy traktowana jako potencjalnie pasująca.
+        """
+        self._refresh_shelf(shelf_idx)
+        orientations = self._orientations(voxel_dims) if self.allow_rotation[shelf_idx] else [voxel_dims]
+
+        for a, b, c in orientations:
+            if not self._in_grid((a, b, c)):
+                continue
+            if not refresh and not self._entry_versions[shelf_idx, b - 1, c - 1] == self._versions[shelf_idx]:
+                return True
+            if self._runs(b, c, np.array([shelf_idx]))[0] >= a:
+                return True
+
+        return False
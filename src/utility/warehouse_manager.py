@@ -1,8 +1,13 @@
 import random
+import numpy as np
 from utility.product import Product
 from utility.rack import Rack
 from utility.shelf import Shelf
-from optimization_algorithms.optimizer import Optimizer
+from utility.fit_cache import fit_cache
+from utility.checkpoint import Checkpoint
+from utility.warehouse_tensor import WarehouseTensor, free_voxels
+from utility.lower_bound import placement_lower_bound
+from optimization_algorithms.optimizer import Optimizer, SearchBudget, optimality_gap
 
 class WarehouseManager:
     
@@ -10,13 +15,35 @@ class WarehouseManager:
         self.racks: list[Rack] = racks
         self.total_cost_incurred = 0.0
         self.pending_products: list[Product] = []
+        # Względna luka kosztu umieszczonych produktów partii do ich dolnego ograniczenia, po jednej wartości na epokę
+        # (None, gdy w epoce nic nie umieszczono)
+        self.epoch_gaps: list[float | None] = []
+        # Liczniki wspólnego cache dopasowań na początku przebiegu - podsumowanie raportuje tylko przyrost z tego przebiegu
+        self._fit_cache_start: tuple[int, int] = (fit_cache.hits, fit_cache.misses)
 
     # Zmieniona sygnatura - przyjmuje teraz `removal_decisions`
-    def start_simulation(self, algorithm: Optimizer, batches: list[list[Product]], removal_decisions: list[list[str]]):
+    # `checkpoint_dir` - zapis stanu po każdej epoce; `resume` - wznowienie od ostatniego zapisu
+    # `budget` - limit przeszukiwania: jeden dla każdej epoki albo lista z osobnym limitem dla każdej epoki
+    def start_simulation(self,
+                         algorithm: Optimizer,
+                         batches: list[list[Product]],
+                         removal_decisions: list[list[str]],
+                         checkpoint_dir: str | None = None,
+                         resume: bool = False,
+                         budget: SearchBudget | list[SearchBudget | None] | None = None):
         num_epochs = len(batches)
         print(f"--- Starting Warehouse Simulation for {num_epochs} epochs using {algorithm.__class__.__name__} ---")
+        self._fit_cache_start = (fit_cache.hits, fit_cache.misses)
+
+        start_epoch = 1
+        if checkpoint_dir and resume and Checkpoint.exists(checkpoint_dir):
+            start_epoch = self.resume_from(checkpoint_dir, algorithm) + 1
+            print(f"Resumed from checkpoint after epoch {start_epoch - 1} ({len(self.pending_products)} products pending).")
         
         for epoch, new_batch in enumerate(batches, 1):
+            if epoch < start_epoch:
+                continue
+
             print(f"\n===== EPOCH {epoch}/{num_epochs} =====")
             
             ids_to_remove = removal_decisions[epoch - 1]
@@ -30,20 +57,56 @@ class WarehouseManager:
             self.pending_products = []
 
             if batch_to_process:
+                # Wolne miejsce przed umieszczeniem partii - do dolnego ograniczenia
+                all_shelves = [shelf for rack in self.racks for shelf in rack.shelves]
+                free_before = free_voxels(all_shelves)
+
                 # Algorytm zwraca produkty, które się nie zmieściły
-                unplaced = algorithm.solve(batch=batch_to_process, racks=self.racks)
+                epoch_budget = budget[epoch - 1] if isinstance(budget, list) else budget
+                unplaced = algorithm.solve(batch=batch_to_process, racks=self.racks, budget=epoch_budget)
                 # Zapisujemy je do kolejki na następną epokę
                 self.pending_products = unplaced
                 
                 self.total_cost_incurred += algorithm.cost
+                self._report_gap(batch_to_process, all_shelves, free_before)
             
             self.print_epoch_summary()
 
+            if checkpoint_dir:
+                Checkpoint.save(checkpoint_dir, self.racks, self.pending_products, epoch, self.total_cost_incurred,
+                                algorithm.state_dict())
+
         print("\n--- Simulation Finished ---")
         if self.pending_products:
             print(f"Warning: {len(self.pending_products)} products remained unplaced after the final epoch.")
         print(f"Total cumulative cost for {algorithm.__class__.__name__}: {self.total_cost_incurred:.2f}")
 
+    def _report_gap(self, batch: list[Product], shelves: list[Shelf], free_before: np.ndarray) -> None:
+        """
+        Luka do dolnego ograniczenia liczona jednakowo dla każdego algorytmu: koszt umieszczonych produktów partii
+        (z ich półek, bez kar za nieumieszczone) wobec ograniczenia dla tych samych produktów na stanie sprzed partii.
+        """
+        placed = [product for product in batch if product.assigned_shelf is not None]
+        placed_cost = sum(product.frequency * (product.assigned_shelf.access_cost + product.assigned_shelf.operational_cost) for product in placed)
+        lower_bound = placement_lower_bound(placed, shelves, free_before) if placed else 0.0
+
+        gap = optimality_gap(placed_cost, lower_bound) if placed else None
+        self.epoch_gaps.append(float(gap) if gap is not None else None)
+        gap_text = f"{gap * 100:.2f}%" if gap is not None else "n/a"
+        print(f"Placed {len(placed)}/{len(batch)} products, cost: {placed_cost:.2f}, lower bound: {lower_bound:.2f}, optimality gap: {gap_text}")
+
+    def resume_from(self, checkpoint_dir: str, algorithm: Optimizer | None = None) -> int:
+        """
+        Odtwarza magazyn, kolejkę i koszt z punktu kontrolnego, a przy podanym `algorithm` także jego stan
+        (strumienie losowe, start z poprzedniej partii). Zwraca numer zapisanej epoki.
+        """
+        checkpoint = Checkpoint.open(checkpoint_dir)
+        self.pending_products = checkpoint.restore(self.racks)
+        self.total_cost_incurred = checkpoint.total_cost
+        if algorithm is not None:
+            algorithm.load_state_dict(checkpoint.optimizer_state)
+        return checkpoint.epoch
+
     # Metoda została całkowicie zmieniona
     def _remove_departing_products(self, products_to_remove_ids: list[str]):
         """
@@ -79,15 +142,25 @@ class WarehouseManager:
         total_occupied_voxels = 0
         total_voxels_capacity = 0
 
-        for rack in self.racks:
-            for shelf in rack.shelves:
-                total_products += shelf.get_products_count
-                total_occupied_voxels += shelf.occupied_voxels_count
-                total_voxels_capacity += Shelf.total_voxels
+        tensor = WarehouseTensor.of(self.racks)
+        if tensor is not None:
+            # Zajętość liczona wektorowo na wspólnym tensorze
+            total_products = sum(rack.get_products_count for rack in self.racks)
+            total_occupied_voxels = int(tensor.occupied_voxels.sum())
+            total_voxels_capacity = len(tensor) * Shelf.total_voxels
+        else:
+            for rack in self.racks:
+                for shelf in rack.shelves:
+                    total_products += shelf.get_products_count
+                    total_occupied_voxels += shelf.occupied_voxels_count
+                    total_voxels_capacity += Shelf.total_voxels
 
         occupancy_percent = (total_occupied_voxels / total_voxels_capacity) * 100 if total_voxels_capacity > 0 else 0
         
         print("\n--- Epoch Summary ---")
         print(f"Total products in warehouse: {total_products}")
         print(f"Warehouse space occupancy: {occupancy_percent:.2f}%")
+        hits, misses = fit_cache.hits - self._fit_cache_start[0], fit_cache.misses - self._fit_cache_start[1]
+        hit_rate = hits / (hits + misses) if hits + misses > 0 else 0.0
+        print(f"Fit cache: {hits} hits, {misses} misses ({hit_rate * 100:.1f}% hit rate)")
         print("--------------------")
\ No newline at end of file
@@ -0,0 +1,98 @@
+import operator
+import numpy as np
+from utility.rack import Rack
+from utility.shelf import Shelf
+from utility.shelf_storage import DenseStorage
+
+class WarehouseTensor:
+    """
+    Wspólny, ciągły tensor `(num_shelves, gx, gy, gz)` dla wszystkich półek magazynu.
+    Każda półka dostaje widoki na swój wycinek, więc zapis lub przywrócenie zajętości
+    całego magazynu to jedna kopia pamięci, a agregaty po półkach liczą się wektorowo.
+    """
+
+    def __init__(self, num_shelves: int, grid_dimension: tuple[int, int, int] = Shelf.grid_dimension):
+
+        self.grid_dimension: tuple[int, int, int] = grid_dimension
+        self.voxel_grids: np.ndarray = np.zeros((num_shelves, *grid_dimension), dtype=np.int8)
+        self.occupancy_indices: np.ndarray = np.zeros((num_shelves, *(d + 1 for d in grid_dimension)), dtype=np.int32)
+        self.occupied_voxels: np.ndarray = np.zeros(num_shelves, dtype=np.int64)
+        self.shelf_costs: np.ndarray = np.zeros(num_shelves, dtype=np.float64)
+        self.shelves: list[Shelf] = []
+        self.racks: list[Rack] = []
+
+    def __len__(self) -> int:
+        return len(self.voxel_grids)
+
+    def make_storage(self, slot: int) -> DenseStorage:
+        """Tworzy reprezentację półki opartą o widoki na wycinek `slot` tensora."""
+        storage = DenseStorage(
+            self.grid_dimension,
+            voxel_grid=self.voxel_grids[slot],
+            occupancy_index=self.occupancy_indices[slot],
+            counter=self.occupied_voxels[slot:slot + 1]
+        )
+        storage.tensor = self
+        return storage
+
+    def register(self, shelf: Shelf) -> None:
+        """Dodaje półkę (utworzoną z `make_storage(len(self.shelves))`) do tensora."""
+        slot = len(self.shelves)
+        if shelf.storage.voxel_grid.base is not self.voxel_grids:
+            raise ValueError(f"Shelf {shelf.shelf_id} is not backed by this warehouse tensor.")
+
+        self.shelves.append(shelf)
+        self.shelf_costs[slot] = shelf.access_cost + shelf.operational_cost
+
+    def register_rack(self, rack: Rack) -> None:
+        """Dodaje regał, którego wszystkie półki są już zarejestrowane w tensorze."""
+        if not all(getattr(shelf.storage, "tensor", None) is self for shelf in rack.shelves):
+            raise ValueError(f"Rack {rack.rack_id} is not backed by this warehouse tensor.")
+        self.racks.append(rack)
+
+    @staticmethod
+    def of(shelves_or_racks: list[Shelf] | list[Rack]) -> "WarehouseTensor | None":
+        """Zwraca tensor, jeśli dokładnie te półki (w tej kolejności) są nim w całości pokryte."""
+        if not shelves_or_racks:
+            return None
+        by_rack = isinstance(shelves_or_racks[0], Rack)
+        first = shelves_or_racks[0].shelves[0] if by_rack and shelves_or_racks[0].shelves else shelves_or_racks[0]
+        tensor = getattr(getattr(first, "storage", None), "tensor", None)
+        if tensor is None:
+            return None
+
+        # Porównanie tożsamości obiektów bez pętli Pythona po półkach
+        registered = tensor.racks if by_rack else tensor.shelves
+        if len(registered) != len(shelves_or_racks) or not all(map(operator.is_, registered, shelves_or_racks)):
+            return None
+        return tensor
+
+    ## - Agregaty
+    def free_voxels(self) -> np.ndarray:
+        return Shelf.total_voxels - self.occupied_voxels
+
+    ## - Zapis i przywrócenie
+    def load(self, voxel_grids: np.ndarray) -> None:
+        """Przywraca zajętość całego magazynu jedną kopią pamięci i przelicza indeksy półek."""
+        np.copyto(self.voxel_grids, voxel_grids)
+        self.rebuild_indices()
+
+    def rebuild_indices(self) -> None:
+        """Przelicza tablice sum prefiksowych i liczniki zajętości wszystkich półek naraz z tensora wokseli."""
+        self.occupancy_indices[:, 1:, 1:, 1:] = self.voxel_grids.cumsum(axis=1, dtype=np.int32).cumsum(axis=2).cumsum(axis=3)
+        self.occupied_voxels[:] = self.voxel_grids.sum(axis=(1, 2, 3))
+
+
+def shelf_costs(shelves: list[Shelf]) -> np.ndarray:
+    """Koszt (access_cost + operational_cost) każdej półki - z tensora, jeśli półki są nim pokryte."""
+    tensor = WarehouseTensor.of(shelves)
+    if tensor is not None:
+        return tensor.shelf_costs
+    return np.array([shelf.access_cost + shelf.operational_cost for shelf in shelves], dtype=np.float64)
+
+def free_voxels(shelves: list[Shelf]) -> np.ndarray:
+    """Liczba wolnych wokseli każdej półki - z tensora, jeśli półki są nim pokryte."""
+    tensor = WarehouseTensor.of(shelves)
+    if tensor is not None:
+        return tensor.free_voxels()
+    return Shelf.total_voxels - np.array([shelf.occupied_voxels_count for shelf in shelves], dtype=np.float64)
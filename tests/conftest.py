@@ -0,0 +1,45 @@
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+# Moduły projektu importują się jako pakiety najwyższego poziomu (tak jak przy uruchamianiu z `src/`)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utility.batch_factory import BatchFactory
+from utility.shelf import Shelf
+from utility.simulation import SimulationScenario
+from utility.warehouse_manager import WarehouseManager
+
+
+@pytest.fixture
+def make_scenario():
+    """Deterministyczny scenariusz (partie, decyzje o usunięciu) dla podanego ziarna."""
+    def make(num_epochs: int = 2, products_per_epoch: int = 60, seed: int = 0):
+        random.seed(seed)
+        np.random.seed(seed)
+        return SimulationScenario(BatchFactory(Shelf.voxel_size), num_epochs, products_per_epoch).generate()
+    return make
+
+
+@pytest.fixture
+def run_simulation():
+    """Uruchamia symulację na świeżych kopiach stanu produktów i zwraca menedżera magazynu."""
+    def run(algorithm, racks, batches, removals, **kwargs):
+        for batch in batches:
+            for product in batch:
+                product.reset()
+        manager = WarehouseManager(racks)
+        manager.start_simulation(algorithm, batches, removals, **kwargs)
+        return manager
+    return run
+
+
+def layout(racks) -> list[tuple]:
+    """Pełne rozmieszczenie magazynu: produkty każdej półki w kolejności, z pozycją i wymiarami."""
+    return [
+        (shelf.shelf_id, [(product.product_id, product.position, product.voxel_dims) for product in shelf.stored_products])
+        for rack in racks for shelf in rack.shelves
+    ]
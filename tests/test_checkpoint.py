@@ -0,0 +1,42 @@
+import random
+
+import numpy as np
+import pytest
+
+from conftest import layout
+from optimization_algorithms.ant import AntColonyOptimizer
+from optimization_algorithms.genetic import GeneticOptimizer
+from optimization_algorithms.greedy import GreedyOptimizer
+from optimization_algorithms.local_search import LocalSearchOptimizer
+from utility.warehouse_factory import WarehouseFactory
+
+OPTIMIZERS = {
+    "greedy": lambda: GreedyOptimizer(),
+    "genetic": lambda: GeneticOptimizer(population_size=10, generations=3, seed=5, warm_start=True),
+    "ant": lambda: AntColonyOptimizer(num_ants=3, generations=2, seed=5, warm_start=True),
+    "ant_sparse": lambda: AntColonyOptimizer(num_ants=3, generations=2, seed=5, warm_start=True, pheromone_model="sparse"),
+    "local_search": lambda: LocalSearchOptimizer(generations=100, seed=5),
+}
+
+
+@pytest.mark.parametrize("storage, contiguous", [("dense", False), ("dense", True), ("bitpacked", False)])
+@pytest.mark.parametrize("name", list(OPTIMIZERS))
+def test_resume_reproduces_uninterrupted_run(make_scenario, run_simulation, tmp_path, name, storage, contiguous):
+    # Rozmiar, przy którym wynik każdego optymalizatora zależy od jego strumienia losowego i stanu z poprzedniej epoki
+    batches, removals = make_scenario(num_epochs=3, products_per_epoch=30)
+    checkpoint_dir = str(tmp_path / "checkpoint")
+
+    def run(num_epochs, **kwargs):
+        # Globalne generatory są częścią stanu punktu kontrolnego - każdy przebieg startuje z tego samego
+        random.seed(1)
+        np.random.seed(1)
+        racks = WarehouseFactory(6, 3, storage=storage).make_racks(contiguous=contiguous)
+        manager = run_simulation(OPTIMIZERS[name](), racks, batches[:num_epochs], removals[:num_epochs], **kwargs)
+        # Przebiegi współdzielą obiekty produktów partii, więc wynik jest odczytywany od razu
+        return manager.total_cost_incurred, layout(racks), [product.product_id for product in manager.pending_products]
+
+    uninterrupted = run(3)
+    run(1, checkpoint_dir=checkpoint_dir)
+    resumed = run(3, checkpoint_dir=checkpoint_dir, resume=True)
+
+    assert resumed == uninterrupted
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from optimization_algorithms.local_search import LocalSearchOptimizer
+from utility.warehouse_factory import WarehouseFactory
+
+
+@pytest.mark.parametrize("storage", ["dense", "bitpacked", "extreme_points"])
+@pytest.mark.parametrize("initial_temperature", [None, 1e6])
+def test_summed_deltas_match_recomputed_cost(make_scenario, storage, initial_temperature):
+    # Mały magazyn: część produktów zostaje nieumieszczona, więc działają też ruchy wstawienia
+    (batch, *_), _removals = make_scenario(num_epochs=1, products_per_epoch=120)
+    racks = WarehouseFactory(3, 2, storage=storage).make_racks()
+    optimizer = LocalSearchOptimizer(generations=15, initial_temperature=initial_temperature, seed=0)
+
+    unplaced = optimizer.solve(batch, racks)
+
+    assert np.isclose(optimizer.tracked_cost, optimizer.batch_cost(batch), rtol=1e-9)
+    assert np.isclose(optimizer.cost, optimizer.batch_cost(batch) - len(unplaced) * optimizer.unplaced_penalty)
+    assert {product.product_id for product in unplaced} == {product.product_id for product in batch if product.assigned_shelf is None}
+
+
+def test_search_does_not_worsen_greedy_start(make_scenario):
+    (batch, *_), _removals = make_scenario(num_epochs=1, products_per_epoch=120)
+    racks = WarehouseFactory(3, 2).make_racks()
+    greedy = LocalSearchOptimizer(generations=0)
+    greedy.solve(batch, racks)
+    greedy_cost = greedy.batch_cost(batch)
+
+    for product in batch:
+        product.reset()
+    racks = WarehouseFactory(3, 2).make_racks()
+    optimizer = LocalSearchOptimizer(generations=15, seed=0)
+    optimizer.solve(batch, racks)
+
+    assert optimizer.batch_cost(batch) <= greedy_cost
@@ -0,0 +1,67 @@
+import random
+
+import numpy as np
+import pytest
+
+from conftest import layout
+from optimization_algorithms.ant import AntColonyOptimizer
+from optimization_algorithms.decomposition import DecompositionOptimizer
+from optimization_algorithms.genetic import GeneticOptimizer
+from optimization_algorithms.island_genetic import IslandGeneticOptimizer
+from utility.warehouse_factory import WarehouseFactory
+
+
+@pytest.fixture
+def run_seeded(make_scenario, run_simulation):
+    """Przebieg symulacji z tym samym stanem początkowym; zwraca koszt, rozmieszczenie i kolejkę oczekujących."""
+    def run(optimizer, storage: str = "dense", products_per_epoch: int = 30, rack_count: int = 6):
+        batches, removals = make_scenario(num_epochs=3, products_per_epoch=products_per_epoch)
+        random.seed(1)
+        np.random.seed(1)
+        racks = WarehouseFactory(rack_count, 3, storage=storage).make_racks()
+        try:
+            manager = run_simulation(optimizer, racks, batches, removals)
+        finally:
+            optimizer.close()
+        return manager.total_cost_incurred, layout(racks), [product.product_id for product in manager.pending_products]
+    return run
+
+
+@pytest.mark.parametrize("storage", ["dense", "bitpacked"])
+def test_genetic_workers_match_serial(run_seeded, storage):
+    settings = dict(population_size=12, generations=4, seed=3, elite_count=2, warm_start=True)
+    serial = run_seeded(GeneticOptimizer(workers=1, **settings), storage)
+    parallel = run_seeded(GeneticOptimizer(workers=2, **settings), storage)
+    assert parallel == serial
+
+
+@pytest.mark.parametrize("topology", ["ring", "full"])
+def test_island_workers_match_serial(run_seeded, topology):
+    settings = dict(islands=3, migration_interval=2, migration_size=1, topology=topology,
+                    population_size=30, generations=8, seed=3, elite_count=1, warm_start=True)
+    serial = run_seeded(IslandGeneticOptimizer(workers=1, **settings))
+    parallel = run_seeded(IslandGeneticOptimizer(workers=3, **settings))
+    assert parallel == serial
+
+
+@pytest.mark.parametrize("pheromone_model", ["dense", "sparse", "class"])
+def test_ant_workers_match_serial(run_seeded, pheromone_model):
+    settings = dict(num_ants=4, generations=3, seed=3, warm_start=True, pheromone_model=pheromone_model)
+    serial_colony = AntColonyOptimizer(workers=1, **settings)
+    parallel_colony = AntColonyOptimizer(workers=2, **settings)
+    serial = run_seeded(serial_colony)
+    parallel = run_seeded(parallel_colony)
+    assert parallel == serial
+    # Liczniki ocen z procesów roboczych trafiają do kolonii w procesie głównym
+    assert parallel_colony._engine.exact_calls == serial_colony._engine.exact_calls > 0
+
+
+@pytest.mark.parametrize("storage", ["dense", "bitpacked"])
+def test_decomposition_workers_match_serial(run_seeded, storage):
+    # Zapełniony magazyn: część produktów grup trafia do przebiegu naprawczego, którego wynik zależy od kolejności
+    def decomposition(workers):
+        return DecompositionOptimizer(GeneticOptimizer(population_size=10, generations=3), groups=3, seed=3, workers=workers)
+
+    serial = run_seeded(decomposition(1), storage, products_per_epoch=150, rack_count=10)
+    parallel = run_seeded(decomposition(3), storage, products_per_epoch=150, rack_count=10)
+    assert parallel == serial
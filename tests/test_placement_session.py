@@ -0,0 +1,105 @@
+import random
+
+import numpy as np
+import pytest
+
+from utility.placement_session import PlacementSession
+from utility.product import Product
+from utility.shelf import Shelf
+
+STORAGES = ["dense", "bitpacked", "extreme_points"]
+
+
+def make_products(count: int, seed: int) -> list[Product]:
+    rng = random.Random(seed)
+    return [
+        Product(f"P{i}", 1.0, (round(rng.uniform(0.1, 0.9), 2), round(rng.uniform(0.1, 0.3), 2), round(rng.uniform(0.1, 0.3), 2)), rng.randint(1, 100), Shelf.voxel_size)
+        for i in range(count)
+    ]
+
+
+def shelf_state(shelf: Shelf) -> tuple:
+    """Wszystko, od czego zależy kolejne wyszukiwanie miejsca na półce."""
+    extra = {key: value.tobytes() for key, value in shelf.storage.export_state().items()}
+    # Reprezentacja ciągła: także lista pudełek i jej kolejność
+    for key in ("box_min", "box_max"):
+        if hasattr(shelf.storage, key):
+            extra[key] = getattr(shelf.storage, key).tobytes()
+    return (
+        shelf.version,
+        [(product.product_id, product.position, product.voxel_dims) for product in shelf.stored_products],
+        shelf.storage.to_dense().tobytes(),
+        float(shelf.storage.occupied_voxels),
+        extra,
+    )
+
+
+def product_state(products: list[Product]) -> list[tuple]:
+    return [(product.assigned_shelf, product.position, product.orientation, product.voxel_dims) for product in products]
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_rollback_restores_shelves_and_products(storage, seed):
+    products = make_products(30, seed)
+    shelves = [Shelf("S0", 100, storage=storage), Shelf("S1", 200, storage=storage)]
+    for product in products[:16]:
+        shelves[0].place_product(product) or shelves[1].place_product(product)
+
+    shelves_before = [shelf_state(shelf) for shelf in shelves]
+    products_before = product_state(products)
+
+    rng = random.Random(seed)
+    with PlacementSession() as session:
+        for _step in range(20):
+            placed = [product for product in products if product.assigned_shelf is not None]
+            if placed and rng.random() < 0.5:
+                product = rng.choice(placed)
+                assert session.remove(product.assigned_shelf, product)
+            else:
+                waiting = [product for product in products if product.assigned_shelf is None]
+                if waiting:
+                    session.place(rng.choice(shelves), rng.choice(waiting))
+        assert len(session) > 5
+
+    assert [shelf_state(shelf) for shelf in shelves] == shelves_before
+    assert product_state(products) == products_before
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_cached_fit_after_rollback_matches_fresh_search(storage):
+    # Po cofnięciu półka wraca do starej wersji, więc wpisy cache z tą wersją muszą nadal opisywać jej stan
+    products = make_products(20, 3)
+    shelf = Shelf("S0", 100, storage=storage)
+    for product in products[:8]:
+        shelf.place_product(product)
+    probes = [shelf.storage.product_dims(product) for product in products[8:]]
+    for voxel_dims in probes:
+        shelf.find_placement_position(voxel_dims)
+
+    with PlacementSession() as session:
+        session.remove(shelf, products[2])
+        session.place(shelf, products[10])
+        session.remove(shelf, products[5])
+        session.place(shelf, products[12])
+
+    for voxel_dims in probes:
+        assert shelf.find_placement_position(voxel_dims) == shelf.storage.find_position(voxel_dims)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_commit_keeps_changes(storage):
+    products = make_products(10, 4)
+    shelf = Shelf("S0", 100, storage=storage)
+    for product in products[:4]:
+        shelf.place_product(product)
+
+    with PlacementSession() as session:
+        assert session.remove(shelf, products[1])
+        assert session.place(shelf, products[6])
+        session.commit()
+
+    assert products[1].assigned_shelf is None
+    assert products[6].assigned_shelf is shelf
+    assert [product.product_id for product in shelf.stored_products] == ["P0", "P2", "P3", "P6"]
+    assert np.isclose(shelf.storage.occupied_voxels, sum(np.prod(product.voxel_dims) for product in shelf.stored_products))
@@ -0,0 +1,88 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from utility.shelf import Shelf
+from utility.shelf_storage import make_storage
+
+# Reprezentacje wokselowe, które muszą odpowiadać na zapytania dokładnie tak jak przegląd siatki
+STORAGES = ["dense", "bitpacked"]
+
+
+def brute_force_position(grid: np.ndarray, voxel_dims: tuple[int, int, int]) -> tuple[int, int, int] | None:
+    """Pierwsza wolna pozycja w kolejności z, y, x - przegląd wszystkich przesunięć."""
+    a, b, c = voxel_dims
+    gx, gy, gz = grid.shape
+    for z, y, x in itertools.product(range(gz - c + 1), range(gy - b + 1), range(gx - a + 1)):
+        if not grid[x:x + a, y:y + b, z:z + c].any():
+            return x, y, z
+    return None
+
+
+def brute_force_free_run(grid: np.ndarray, b: int, c: int) -> int:
+    """Najdłuższa seria wzdłuż x, w której przekrój b x c jest wolny - dla każdego przesunięcia (y, z)."""
+    gx, gy, gz = grid.shape
+    best = 0
+    for y, z in itertools.product(range(gy - b + 1), range(gz - c + 1)):
+        run = 0
+        for x in range(gx):
+            run = run + 1 if not grid[x, y:y + b, z:z + c].any() else 0
+            best = max(best, run)
+    return best
+
+
+def random_states(storage_name: str, seed: int, steps: int = 25):
+    """Losowe umieszczenia i zdjęcia pudełek; po każdym kroku zwraca reprezentację i jej siatkę odniesienia."""
+    rng = np.random.default_rng(seed)
+    storage = make_storage(storage_name, Shelf.grid_dimension)
+    reference = np.zeros(Shelf.grid_dimension, dtype=np.int8)
+    boxes = []
+    for _step in range(steps):
+        if boxes and rng.random() < 0.3:
+            position, voxel_dims = boxes.pop(int(rng.integers(len(boxes))))
+            storage.release(position, voxel_dims)
+            x, y, z = position
+            a, b, c = voxel_dims
+            reference[x:x + a, y:y + b, z:z + c] = 0
+        else:
+            voxel_dims = tuple(int(v) for v in rng.integers(1, [12, 4, 4]))
+            position = brute_force_position(reference, voxel_dims)
+            if position is not None:
+                storage.occupy(position, voxel_dims)
+                x, y, z = position
+                a, b, c = voxel_dims
+                reference[x:x + a, y:y + b, z:z + c] = 1
+                boxes.append((position, voxel_dims))
+        yield storage, reference
+
+
+@pytest.mark.parametrize("storage_name", STORAGES)
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_find_position_matches_brute_force(storage_name, seed):
+    probes = [(1, 1, 1), (3, 2, 2), (10, 5, 5), (5, 3, 4), (49, 1, 1), (2, 5, 1)]
+    for storage, reference in random_states(storage_name, seed):
+        assert np.array_equal(storage.to_dense(), reference)
+        assert storage.occupied_voxels == int(reference.sum())
+        for voxel_dims in probes:
+            expected = brute_force_position(reference, voxel_dims)
+            found = storage.find_position(voxel_dims)
+            assert (tuple(int(v) for v in found) if found is not None else None) == expected
+            assert storage.is_free(expected, voxel_dims) if expected is not None else True
+
+
+@pytest.mark.parametrize("storage_name", STORAGES)
+@pytest.mark.parametrize("seed", [0, 1])
+def test_free_run_matches_brute_force(storage_name, seed):
+    for storage, reference in random_states(storage_name, seed, steps=15):
+        for b, c in [(1, 1), (2, 3), (5, 5), (4, 1)]:
+            assert storage.free_run(b, c) == brute_force_free_run(reference, b, c)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_bitpacked_matches_dense(seed):
+    for (dense, _reference), (bitpacked, _) in zip(random_states("dense", seed), random_states("bitpacked", seed)):
+        assert np.array_equal(bitpacked.to_dense(), dense.to_dense())
+        assert bitpacked.free_extents() == dense.free_extents()
+        for voxel_dims in [(1, 1, 1), (4, 2, 3), (12, 4, 4)]:
+            assert bitpacked.find_position(voxel_dims) == dense.find_position(voxel_dims)